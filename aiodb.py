@@ -0,0 +1,123 @@
+import pandas as pd
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.sql import text
+
+from config import config
+from instrumentation import phase
+from db import (
+    Earnings,
+    Dividend,
+    Split,
+    CongressionalTrade,
+    calendars,
+    in_current_week,
+)
+
+
+if config.postgres.host:
+    engine = create_async_engine(
+        f"postgresql+asyncpg://{config.postgres.user}:{config.postgres.password}@{config.postgres.host}:{config.postgres.port}/{config.postgres.database}",
+        pool_size=config.postgres.pool_size,
+        max_overflow=config.postgres.max_overflow,
+        pool_timeout=config.postgres.pool_timeout,
+        pool_recycle=config.postgres.pool_recycle,
+        pool_pre_ping=config.postgres.pool_pre_ping,
+    )
+else:
+    engine = create_async_engine(f"sqlite+aiosqlite:///db.sqlite")
+
+
+async def read_sql(query, timeout=None):
+    """The asynchronous counterpart of pd.read_sql for the queries built by
+    the models in db. On Postgres the query is cancelled by the server after
+    `timeout` seconds, as db._statement_timeout does."""
+    async with engine.connect() as connection:
+        with phase("sql"):
+            if timeout and engine.dialect.name == "postgresql":
+                await connection.execute(
+                    text("SELECT set_config('statement_timeout', :ms, true)"),
+                    {"ms": str(int(timeout * 1000))},
+                )
+            result = await connection.execute(query)
+            return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+async def read_calendar(name, query, start, end):
+    """The asynchronous counterpart of db._read_calendar, sharing its cache of
+    ranges within the current week."""
+    cacheable = in_current_week(start, end)
+    if cacheable:
+        df = calendars.get((name, start, end))
+        if df is not None:
+            return df.copy()
+
+    df = await read_sql(query)
+
+    if cacheable:
+        calendars.set((name, start, end), df.copy())
+    return df
+
+
+async def earnings_by_date(date):
+    return await read_sql(Earnings.by_date_query(date))
+
+
+async def earnings_between(start, end):
+    return await read_calendar(
+        "earnings", Earnings.between_query(start, end), start, end
+    )
+
+
+async def earnings(tickers, before=None, after=None, timeout=None):
+    return await read_sql(
+        Earnings.list_query(tickers, before=before, after=after), timeout=timeout
+    )
+
+
+async def dividends_by_date(date):
+    return await read_sql(Dividend.by_date_query(date))
+
+
+async def dividends_between(start, end):
+    return await read_calendar(
+        "dividends", Dividend.between_query(start, end), start, end
+    )
+
+
+async def dividends(tickers, before=None, after=None, timeout=None):
+    return await read_sql(
+        Dividend.list_query(tickers, before=before, after=after), timeout=timeout
+    )
+
+
+async def splits_by_date(date):
+    return await read_sql(Split.by_date_query(date))
+
+
+async def splits_between(start, end):
+    return await read_calendar("splits", Split.between_query(start, end), start, end)
+
+
+async def splits(tickers, before=None, after=None, timeout=None):
+    return await read_sql(
+        Split.list_query(tickers, before=before, after=after), timeout=timeout
+    )
+
+
+async def congressional_trades_by_date(date):
+    return await read_sql(CongressionalTrade.by_date_query(date))
+
+
+async def congressional_trades_between(start, end):
+    return await read_calendar(
+        "congressional_trades", CongressionalTrade.between_query(start, end), start, end
+    )
+
+
+async def congressional_trades(
+    tickers, before=None, after=None, body=None, timeout=None
+):
+    return await read_sql(
+        CongressionalTrade.list_query(tickers, before=before, after=after, body=body),
+        timeout=timeout,
+    )
@@ -0,0 +1,79 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config import config
+from instrumentation import mongo_pool_listener, phase
+from mongo import (
+    uri,
+    Articles,
+    TIMELINE_PROJECTION,
+    TIMELINE_SORT,
+    after_cursor,
+    paginate,
+    split_activity,
+)
+
+
+client = AsyncIOMotorClient(
+    uri,
+    document_class=dict,
+    tz_aware=False,
+    maxPoolSize=config.mongo.max_pool_size,
+    minPoolSize=config.mongo.min_pool_size,
+    maxIdleTimeMS=config.mongo.max_idle_time_ms,
+    waitQueueTimeoutMS=config.mongo.wait_queue_timeout_ms,
+    event_listeners=[mongo_pool_listener],
+)
+
+
+async def timeline(query, limit=None, cursor=None, timeout=None):
+    """The asynchronous counterpart of Articles.timeline."""
+    collection = client[config.mongo.db]["articles"]
+    find = collection.find(
+        after_cursor(query, cursor),
+        TIMELINE_PROJECTION,
+        sort=TIMELINE_SORT,
+        batch_size=config.mongo.batch_size,
+    )
+    if limit:
+        find = find.limit(limit + 1)
+    if timeout:
+        find = find.max_time_ms(int(timeout * 1000))
+
+    with phase("mongo"):
+        return paginate(await find.to_list(length=None), limit)
+
+
+async def transcripts(
+    tickers, before=None, after=None, limit=None, cursor=None, timeout=None
+):
+    return await timeline(
+        Articles.transcripts_query(tickers, before=before, after=after),
+        limit=limit,
+        cursor=cursor,
+        timeout=timeout,
+    )
+
+
+async def news(tickers, before=None, after=None, limit=None, cursor=None, timeout=None):
+    return await timeline(
+        Articles.news_query(tickers, before=before, after=after),
+        limit=limit,
+        cursor=cursor,
+        timeout=timeout,
+    )
+
+
+async def activity(
+    tickers, before=None, after=None, limit=None, cursors=None, timeout=None
+):
+    """The asynchronous counterpart of Articles.activity."""
+    pipeline = Articles.activity_pipeline(
+        tickers, before=before, after=after, limit=limit, cursors=cursors
+    )
+    options = {"batchSize": config.mongo.batch_size}
+    if timeout:
+        options["maxTimeMS"] = int(timeout * 1000)
+
+    with phase("mongo"):
+        articles = client[config.mongo.db]["articles"].aggregate(pipeline, **options)
+        return split_activity(await articles.to_list(length=None), limit)
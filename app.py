@@ -1,8 +1,15 @@
+import functools
+import hashlib
 import json
+import orjson
 import pandas as pd
 import numpy as np
 import datetime
-from flask import Flask, request
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, wait
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Flask, Response, request, stream_with_context
 from flask.json import jsonify, JSONEncoder
 from flask_cors import CORS
 from prometheus_flask_exporter import PrometheusMetrics
@@ -12,9 +19,18 @@ from pypfopt.efficient_frontier import EfficientFrontier
 from bson import ObjectId
 
 from config import config
+from cache import LRUCache
+from instrumentation import (
+    bind_endpoint,
+    phase,
+    register_phase_metrics,
+    register_pool_metrics,
+)
+import arguments
 import db
 import mongo
-from sickle import update_basic_company_info
+from refresh import RefreshQueue
+from sickle import TokenBucket, update_basic_company_info
 
 
 def snake_case_to_camel_case(name):
@@ -44,6 +60,25 @@ app.config["JSON_SORT_KEYS"] = False
 CORS(app, supports_credentials=True)
 metrics = PrometheusMetrics(app)
 metrics.info("market", "Market API", version="0.1.0")
+register_pool_metrics(metrics.registry, db.engine)
+if config.metrics.phases:
+    register_phase_metrics(metrics.registry)
+
+executor = ThreadPoolExecutor(max_workers=config.activity.workers)
+
+# Company info is refreshed from yfinance in the background, requests being
+# served whatever is stored in the meantime.
+refreshes = RefreshQueue(
+    update_basic_company_info,
+    max_age=datetime.timedelta(days=config.refresh.max_age_days),
+    workers=config.refresh.workers,
+    bucket=TokenBucket(rate=config.refresh.rate),
+    backoff=config.refresh.backoff,
+)
+
+# Optimal portfolios keyed by the tickers, the window of prices and the most
+# recent ingestion of prices. The result only changes when prices are ingested.
+optimizations = LRUCache(maxsize=config.cache.optimizer_size)
 
 
 class JSONEncoder(json.JSONEncoder):
@@ -65,219 +100,334 @@ class JSONEncoder(json.JSONEncoder):
 
 app.json_encoder = JSONEncoder
 
+ORJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+)
 
-@app.route("/api/ping")
-def ping():
-    return jsonify({"message": "pong"})
 
+def orjson_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
 
-@app.route("/api/market/earnings")
-def earnings():
-    args = request.args
-    date = args.get("date", datetime.date.today())
+    if obj is pd.NaT:
+        return None
 
-    if isinstance(date, str):
-        try:
-            date = datetime.datetime.fromisoformat(date).date()
-        except Exception as e:
-            return (
-                jsonify(
-                    {
-                        "error": '"date" must be a valid date string i.e. "YYYY-MM-DD"',
-                    }
-                ),
-                400,
-            )
+    # Subclasses such as pd.Timestamp are not serialized natively.
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
 
-    df = db.Earnings.by_date(date)
+    raise TypeError
 
-    df.columns = df.columns.to_series().apply(snake_case_to_camel_case)
 
-    return jsonify(
-        {
-            "date": date,
-            "columns": df.columns.tolist(),
-            "data": df.to_dict(orient="records"),
-        }
+def fast_jsonify(payload, status=200):
+    """Serialize the payload with orjson, which writes NaN as null and numpy
+    arrays and scalars directly, rather than through JSONEncoder."""
+    return Response(
+        orjson.dumps(payload, default=orjson_default, option=ORJSON_OPTIONS),
+        status=status,
+        mimetype="application/json",
     )
 
 
-@app.route("/api/market/dividends")
-def dividends():
-    args = request.args
-    date = args.get("date", datetime.date.today())
+def frame_rows(df):
+    """Return the rows of a frame with a "date" column followed by numeric
+    columns as lists, converting each column at once rather than each cell."""
+    dates = np.datetime_as_string(df["date"].to_numpy(), unit="s").tolist()
+    rows = df.drop(columns="date").to_numpy(dtype="float64").tolist()
+    for d, row in zip(dates, rows):
+        row.insert(0, d)
+    return rows
 
-    if isinstance(date, str):
-        try:
-            date = datetime.datetime.fromisoformat(date).date()
-        except Exception as e:
-            return (
-                jsonify(
-                    {
-                        "error": '"date" must be a valid date string i.e. "YYYY-MM-DD"',
-                    }
-                ),
-                400,
+
+STREAM_FORMATS = ["ndjson"]
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+
+def ndjson_response(header, chunks):
+    """Stream a header line followed by one line per row, serializing a chunk
+    of rows at a time so memory is bounded by the chunk size."""
+
+    def generate():
+        yield orjson.dumps(header, default=orjson_default, option=ORJSON_OPTIONS)
+        for chunk in chunks:
+            yield b"".join(
+                orjson.dumps(row, default=orjson_default, option=ORJSON_OPTIONS)
+                for row in chunk
             )
 
-    df = db.Dividend.by_date(date)
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
-    df.columns = df.columns.to_series().apply(snake_case_to_camel_case)
 
-    return jsonify(
-        {
-            "date": date,
-            "columns": df.columns.tolist(),
-            "data": df.to_dict(orient="records"),
-        }
-    )
+# The datasets the responses of the price and company endpoints are derived
+# from. A company refresh never changes the validators of price responses.
+PRICE_DATASETS = ["prices", "price_rollups"]
+COMPANY_DATASETS = ["companies", "prices", "latest_prices"]
 
 
-@app.route("/api/market/splits")
-def splits():
-    args = request.args
-    date = args.get("date", datetime.date.today())
+def conditional(datasets):
+    """Answer requests carrying an If-None-Match header for a response that is
+    still current with 304 Not Modified. The ETag is derived from the most
+    recent ingestion of the `datasets` the response is derived from, the
+    current day (as default windows are relative to it), the path, the
+    normalized query parameters and the Accept header so it can be checked
+    without running the view."""
 
-    if isinstance(date, str):
-        try:
-            date = datetime.datetime.fromisoformat(date).date()
-        except Exception as e:
-            return (
-                jsonify(
-                    {
-                        "error": '"date" must be a valid date string i.e. "YYYY-MM-DD"',
-                    }
-                ),
-                400,
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            ingested = db.Ingestion.latest(datasets)
+            params = sorted(
+                (key, value.strip().upper() if key == "tickers" else value.strip())
+                for key, value in request.args.items(multi=True)
             )
+            etag = hashlib.sha1(
+                repr(
+                    (
+                        ingested,
+                        datetime.date.today(),
+                        request.path,
+                        params,
+                        request.headers.get("Accept"),
+                    )
+                ).encode()
+            ).hexdigest()
+
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.vary.add("Accept")
+            if ingested:
+                response.last_modified = ingested
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def fan_out(sources, timeout):
+    """Run each source concurrently on the shared executor. Returns the results
+    of the sources that completed within `timeout` seconds along with the names
+    of those that timed out or failed. Every source is given the whole timeout,
+    counted from when they are all submitted, rather than what a slower source
+    before it left over. A source that is already running cannot be cancelled,
+    so sources should bound their own queries by `timeout` too."""
+    futures = {name: executor.submit(bind_endpoint(fn)) for name, fn in sources.items()}
+    done, _ = wait(futures.values(), timeout=timeout)
+
+    results = {}
+    partial = []
+    for name, future in futures.items():
+        if future not in done:
+            future.cancel()
+            app.logger.warning(f'"{name}" did not complete within {timeout}s')
+            partial.append(name)
+            continue
 
-    df = db.Split.by_date(date)
+        try:
+            results[name] = future.result()
+        except Exception:
+            app.logger.exception(f'"{name}" failed')
+            partial.append(name)
 
-    df.columns = df.columns.to_series().apply(snake_case_to_camel_case)
+    return results, partial
 
-    return jsonify(
-        {
-            "date": date,
-            "columns": df.columns.tolist(),
-            "data": df.to_dict(orient="records"),
-        }
+
+def negotiate_frame_format():
+    """Return the binary mimetype requested through the Accept header or None
+    if the response should be JSON."""
+    best = request.accept_mimetypes.best_match(
+        ["application/json", ARROW_STREAM, PARQUET]
     )
+    return best if best in [ARROW_STREAM, PARQUET] else None
 
 
-@app.route("/api/market/congressional_trades")
-def congressional_trades():
+def frame_response(df, mimetype):
+    """Serialize a DataFrame directly to Arrow IPC stream or Parquet bytes."""
+    with phase("serialize"):
+        table = pa.Table.from_pandas(df.infer_objects(), preserve_index=False)
+        sink = pa.BufferOutputStream()
+
+        if mimetype == ARROW_STREAM:
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            pq.write_table(table, sink)
+
+    response = Response(sink.getvalue().to_pybytes(), mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
+
+
+def calendar(by_date, between, date_column):
+    """Respond with the rows of a calendar on the "date" query parameter, today
+    by default, or between the "start" and "end" query parameters, inclusive,
+    grouped by day."""
     args = request.args
-    date = args.get("date", datetime.date.today())
+    if "start" in args or "end" in args:
+        bounds, error = arguments.calendar_range(args)
+        if error:
+            return jsonify({"error": error}), 400
 
-    if isinstance(date, str):
-        try:
-            date = datetime.datetime.fromisoformat(date).date()
-        except Exception as e:
-            return (
-                jsonify(
-                    {
-                        "error": '"date" must be a valid date string i.e. "YYYY-MM-DD"',
-                    }
-                ),
-                400,
-            )
+        df = between(*bounds)
 
-    df = db.CongressionalTrade.by_date(date)
+        with phase("serialize"):
+            return fast_jsonify(calendar_range_payload(*bounds, df, date_column))
 
-    df.columns = df.columns.to_series().apply(snake_case_to_camel_case)
+    date, error = arguments.calendar_date(args)
+    if error:
+        return jsonify({"error": error}), 400
 
-    return jsonify(
-        {
-            "date": date,
-            "columns": df.columns.tolist(),
-            "data": df.to_dict(orient="records"),
-        }
-    )
+    df = by_date(date)
 
+    with phase("serialize"):
+        return fast_jsonify(calendar_payload(date, df))
 
-@app.route("/api/market/activity")
-def activity():
-    args = request.args
-    tickers = args.get("tickers", [])
-    before = args.get("before", None)
-    after = args.get("after", datetime.date.today() - datetime.timedelta(days=120))
 
-    if isinstance(tickers, str):
-        tickers = tickers.upper().split(",")
+def calendar_payload(date, df):
+    df = df.rename(columns=snake_case_to_camel_case)
+    return {
+        "date": date,
+        "columns": df.columns.tolist(),
+        "data": df.to_dict(orient="records"),
+    }
 
-    if len(tickers) < 1:
-        return (
-            jsonify(
-                {
-                    "error": '"tickers" is a required query parameter',
-                }
-            ),
-            400,
-        )
 
-    if isinstance(before, str):
-        try:
-            before = datetime.datetime.fromisoformat(before)
-        except Exception as e:
-            return (
-                jsonify(
-                    {
-                        "error": '"before" must be a valid date string i.e. "YYYY-MM-DD"',
-                    }
-                ),
-                400,
-            )
+def calendar_range_payload(start, end, df, date_column):
+    return {
+        "start": start,
+        "end": end,
+        "columns": [snake_case_to_camel_case(c) for c in df.columns],
+        "days": group_by_day(df, date_column),
+    }
 
-    if isinstance(after, str):
-        try:
-            after = datetime.datetime.fromisoformat(after)
-        except Exception as e:
-            return (
-                jsonify(
-                    {
-                        "error": '"after" must be a valid date string i.e. "YYYY-MM-DD"',
-                    }
-                ),
-                400,
-            )
 
-    earnings = db.Earnings.list(tickers, before=before, after=after)
-    splits = db.Split.list(tickers, before=before, after=after)
-    dividends = db.Dividend.list(tickers, before=before, after=after)
-    congressional_trades = db.CongressionalTrade.list(
-        tickers, before=before, after=after
-    )
-    transcripts = mongo.Articles.transcripts(tickers, before=before, after=after)
-    news = mongo.Articles.news(tickers, before=before, after=after)
-
-    earnings.columns = earnings.columns.to_series().apply(snake_case_to_camel_case)
-    splits.columns = splits.columns.to_series().apply(snake_case_to_camel_case)
-    dividends.columns = dividends.columns.to_series().apply(snake_case_to_camel_case)
-    congressional_trades.columns = congressional_trades.columns.to_series().apply(
-        snake_case_to_camel_case
+def group_by_day(df, date_column):
+    """Return the rows of a calendar as records keyed by their day."""
+    df = df.rename(columns=snake_case_to_camel_case)
+    return {
+        day.isoformat(): rows.to_dict(orient="records")
+        for day, rows in df.groupby(snake_case_to_camel_case(date_column), sort=True)
+    }
+
+
+def activity_payload(params, results, partial):
+    """Shape the results of the activity sources into the response. Transcripts
+    and news are read together as "articles", each a page along with the
+    cursor of the next page."""
+    cursors = dict(params.cursors)
+    articles = results.pop("articles", {})
+    for name in ["transcripts", "news"]:
+        results[name], cursors[name] = articles.get(name, ([], None))
+
+    if "articles" in partial:
+        partial = [p for p in partial if p != "articles"] + ["transcripts", "news"]
+
+    for name, df in results.items():
+        if isinstance(df, pd.DataFrame):
+            df.columns = df.columns.to_series().apply(snake_case_to_camel_case)
+            results[name] = df.to_dict(orient="records")
+
+    return {
+        "tickers": params.tickers,
+        "before": params.before,
+        "after": params.after,
+        "earnings": results.get("earnings", []),
+        "dividends": results.get("dividends", []),
+        "splits": results.get("splits", []),
+        "congressionalTrades": results.get("congressionalTrades", []),
+        "transcripts": results.get("transcripts", []),
+        "news": results.get("news", []),
+        "cursors": cursors,
+        "partial": partial,
+    }
+
+
+@app.route("/api/ping")
+def ping():
+    return jsonify({"message": "pong"})
+
+
+@app.route("/api/market/earnings")
+def earnings():
+    return calendar(db.Earnings.by_date, db.Earnings.between, "date")
+
+
+@app.route("/api/market/dividends")
+def dividends():
+    return calendar(db.Dividend.by_date, db.Dividend.between, "ex_date")
+
+
+@app.route("/api/market/splits")
+def splits():
+    return calendar(db.Split.by_date, db.Split.between, "date")
+
+
+@app.route("/api/market/congressional_trades")
+def congressional_trades():
+    return calendar(
+        db.CongressionalTrade.by_date,
+        db.CongressionalTrade.between,
+        "transaction_date",
     )
 
-    return jsonify(
+
+@app.route("/api/market/activity")
+def activity():
+    params, error = arguments.activity(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    tickers, before, after = params.tickers, params.before, params.after
+
+    # Each query is also given the timeout so that the database stops working
+    # on it once the response has been sent without it.
+    timeout = config.activity.timeout
+    results, partial = fan_out(
         {
-            "tickers": tickers,
-            "before": before,
-            "after": after,
-            "earnings": earnings.to_dict(orient="records"),
-            "dividends": dividends.to_dict(orient="records"),
-            "splits": splits.to_dict(orient="records"),
-            "congressionalTrades": congressional_trades.to_dict(orient="records"),
-            "transcripts": transcripts,           
-            "news": news,
-        }
+            "earnings": lambda: db.Earnings.list(
+                tickers, before=before, after=after, timeout=timeout
+            ),
+            "splits": lambda: db.Split.list(
+                tickers, before=before, after=after, timeout=timeout
+            ),
+            "dividends": lambda: db.Dividend.list(
+                tickers, before=before, after=after, timeout=timeout
+            ),
+            "congressionalTrades": lambda: db.CongressionalTrade.list(
+                tickers, before=before, after=after, timeout=timeout
+            ),
+            "articles": lambda: mongo.Articles.activity(
+                tickers,
+                before=before,
+                after=after,
+                limit=params.limit,
+                cursors=params.cursors,
+                timeout=timeout,
+            ),
+        },
+        timeout=timeout,
     )
 
+    with phase("serialize"):
+        return fast_jsonify(activity_payload(params, results, partial))
+
 
 @app.route("/api/market/prices")
+@conditional(PRICE_DATASETS)
 def price():
     args = request.args
     tickers = args.get("tickers", "").upper().split(",")
     start = args.get("start", datetime.datetime.now() - datetime.timedelta(days=30))
     end = args.get("end", datetime.datetime.now())
+    stream = args.get("stream", None)
 
     if len(tickers) < 1:
         return (
@@ -289,25 +439,75 @@ def price():
             400,
         )
 
+    if stream and stream not in STREAM_FORMATS:
+        return (
+            jsonify(
+                {
+                    "error": '"stream" must be one of ["ndjson"]',
+                }
+            ),
+            400,
+        )
+
+    if stream:
+        return ndjson_response(
+            {
+                "tickers": tickers,
+                "start": start,
+                "end": end,
+                "columns": ["date", *sorted(set(tickers))],
+            },
+            db.Price.stream(tickers=tickers, start=start, end=end),
+        )
+
     df = db.Price.get(tickers=tickers, start=start, end=end).reset_index()
-    df["date"] = df["date"].map(lambda x: x.isoformat())
 
-    return jsonify(
-        {
-            "tickers": tickers,
-            "start": start,
-            "end": end,
-            "columns": df.columns.tolist(),
-            "data": df.values.tolist(),
-        }
-    )
+    mimetype = negotiate_frame_format()
+    if mimetype:
+        return frame_response(df, mimetype)
+
+    with phase("serialize"):
+        return fast_jsonify(
+            {
+                "tickers": tickers,
+                "start": start,
+                "end": end,
+                "columns": df.columns.tolist(),
+                "data": frame_rows(df),
+            }
+        )
 
 
 @app.route("/api/market/tickers")
 def tickers():
     args = request.args
     search = args.get("search", "")
-    companies = db.Company.list(search)
+    limit = args.get("limit", None)
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            return (
+                jsonify(
+                    {
+                        "error": '"limit" must be an integer',
+                    }
+                ),
+                400,
+            )
+
+        if limit < 1:
+            return (
+                jsonify(
+                    {
+                        "error": '"limit" must be greater than 0',
+                    }
+                ),
+                400,
+            )
+
+    companies = db.Company.list(search, limit=limit)
     return jsonify(
         [
             {
@@ -322,7 +522,63 @@ def tickers():
     )
 
 
+def optimize(p):
+    mu = mean_historical_return(p)
+    S = CovarianceShrinkage(p).ledoit_wolf()
+    ef = EfficientFrontier(mu, S)
+    ef.max_sharpe()
+    cleaned_weights = ef.clean_weights()
+    performance = ef.portfolio_performance(verbose=True)
+
+    return SimpleNamespace(mu=mu, S=S, weights=cleaned_weights, performance=performance)
+
+
+def period_closes(p, frequency):
+    """Return the close at the end of each period over the window of daily
+    closes `p`. Weekly and monthly closes are read from the rollups
+    materialized by sickle and the daily closes are only resampled when the
+    rollups are not up to date or for other frequencies."""
+    if p.empty or frequency not in db.PriceRollup.FREQUENCIES:
+        return p.resample(frequency).last()
+
+    first = db.PriceRollup.label(p.index.min(), frequency)
+    last = db.PriceRollup.label(p.index.max(), frequency)
+    closes = db.PriceRollup.get(list(p.columns), frequency, first, last)
+
+    # The rollups are only trusted when they hold every period of the window
+    # from each symbol's first close on, so that a refresh that was missed or
+    # covered only part of the history falls back to resampling.
+    occupied = p.index.to_period(frequency).end_time.normalize()
+    for symbol in p.columns:
+        first_valid = p[symbol].first_valid_index()
+        if first_valid is None:
+            continue
+
+        expected = occupied[p.index >= first_valid].unique()
+        if (
+            symbol not in closes
+            or not expected.isin(closes[symbol].dropna().index).all()
+        ):
+            return p.resample(frequency).last()
+
+    closes = closes.reindex(
+        index=pd.date_range(first, last, freq=frequency, name="date"),
+        columns=p.columns,
+    )
+
+    # The last period may extend past the end of the window.
+    closes.iloc[-1] = p.iloc[-1].astype(float)
+
+    # Carry closes forward into periods a symbol did not trade in, as the
+    # daily closes are, while leaving periods without any prices empty.
+    closes = closes.ffill()
+    closes[~closes.index.isin(occupied)] = np.nan
+
+    return closes
+
+
 @app.route("/api/market/performance")
+@conditional(PRICE_DATASETS)
 def performance():
     args = request.args
     tickers = args.get("tickers", "").upper().split(",")
@@ -389,111 +645,192 @@ def performance():
 
     p = db.Price.get(tickers=tickers, start=start, end=end)
 
-    mu = mean_historical_return(p)
-    S = CovarianceShrinkage(p).ledoit_wolf()
-    ef = EfficientFrontier(mu, S)
-    ef.max_sharpe()
-    cleaned_weights = ef.clean_weights()
-    expected, volatility, sharpe = ef.portfolio_performance(verbose=True)
+    key = (
+        tuple(sorted(set(tickers))),
+        p.index.min(),
+        p.index.max(),
+        db.Ingestion.latest(["prices"]),
+    )
+    optimal = optimizations.get(key)
+    if optimal is None:
+        with phase("optimize"):
+            optimal = optimize(p)
+        optimizations.set(key, optimal)
+
+    cleaned_weights = optimal.weights
+    expected, volatility, sharpe = optimal.performance
+
+    with phase("resample"):
+        p = period_closes(p, frequency)
+
+    with phase("returns"):
+        value = p * shares
+        portfolio_returns = value.sum(axis=1).pct_change().iloc[1:]
+
+        returns = p.pct_change().iloc[1:, :]
+        df = pd.DataFrame()
+        df["mean"] = returns.mean()
+        df["std"] = returns.std()
+
+        portfolio = {
+            "return": portfolio_returns.mean(),
+            "std": portfolio_returns.std(),
+        }
+
+        returns["Portfolio"] = portfolio_returns
+        returns.index = returns.index.strftime("%Y-%m-%d")
+
+    with phase("serialize"):
+        return fast_jsonify(
+            {
+                "tickers": tickers,
+                "start": start,
+                "end": end,
+                "frequency": frequency,
+                "optimal": {
+                    "expected": expected,
+                    "volatility": volatility,
+                    "sharpe": sharpe,
+                    "weights": cleaned_weights,
+                },
+                "portfolio": portfolio,
+                "positions": df.to_dict(orient="index"),
+                "returns": returns.reset_index().to_dict(orient="records"),
+                "value": value.sum(axis=1)
+                .rename("value")
+                .reset_index()
+                .to_dict(orient="records"),
+            }
+        )
 
-    p = p.resample(frequency).apply(lambda x: x[-1])
 
-    value = p * shares
-    portfolio_returns = value.sum(axis=1).pct_change().iloc[1:]
+# The most tickers the companies endpoint resolves in one request.
+MAX_COMPANIES = 100
 
-    returns = p.pct_change().iloc[1:, :]
-    df = pd.DataFrame()
-    df["mean"] = returns.mean()
-    df["std"] = returns.std()
 
-    portfolio = {
-        "return": portfolio_returns.mean(),
-        "std": portfolio_returns.std(),
+def company_info(c, price):
+    return {
+        "ticker": c.ticker,
+        "cik": c.cik,
+        "name": c.name,
+        "sector": c.sector,
+        "logo": c.logo,
+        "description": c.description,
+        "sharesOutstanding": c.shares_outstanding,
+        "price": price,
     }
 
-    returns["Portfolio"] = portfolio_returns
-    returns.index = returns.index.strftime("%Y-%m-%d")
 
-    df = df.replace({np.nan: None})
-    returns = returns.replace({np.nan: None})
-    value = value.replace({np.nan: None})
+@app.route("/api/market/companies")
+@conditional(COMPANY_DATASETS)
+def companies():
+    tickers = request.args.get("tickers", "").upper().split(",")
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+
+    if len(tickers) < 1:
+        return (
+            jsonify(
+                {
+                    "error": '"tickers" is a required query parameter',
+                }
+            ),
+            400,
+        )
+
+    if len(tickers) > MAX_COMPANIES:
+        return (
+            jsonify(
+                {
+                    "error": f'"tickers" must contain at most {MAX_COMPANIES} values',
+                }
+            ),
+            400,
+        )
+
+    found = db.Company.get_many(tickers)
+    for c in found.values():
+        refreshes.refresh_if_stale(c)
+
+    prices = db.LatestPrice.get_many(
+        list(found), since=datetime.date.today() - datetime.timedelta(days=30)
+    )
+
     return jsonify(
         {
-            "tickers": tickers,
-            "start": start,
-            "end": end,
-            "frequency": frequency,
-            "optimal": {
-                "expected": expected,
-                "volatility": volatility,
-                "sharpe": sharpe,
-                "weights": cleaned_weights,
-            },
-            "portfolio": portfolio,
-            "positions": df.to_dict(orient="index"),
-            "returns": returns.reset_index().to_dict(orient="records"),
-            "value": value.sum(axis=1)
-            .rename("value")
-            .reset_index()
-            .to_dict(orient="records"),
+            "companies": [
+                company_info(found[t], prices[t].close if t in prices else None)
+                for t in tickers
+                if t in found
+            ],
+            "missing": [t for t in tickers if t not in found],
         }
     )
 
 
 @app.route("/api/market/<ticker>")
+@conditional(COMPANY_DATASETS)
 def info(ticker):
     c = db.Company.get(ticker.upper())
 
-    if c.last_modified == None:
-        info = update_basic_company_info(ticker.upper())
-        c.description = info.description
-        c.name = info.name
-        c.sector = info.sector
-        c.shares_outstanding = info.shares_outstanding
-        c.logo = info.logo
-
     if c == None:
         return jsonify({"error": f'no company found with ticker "{ticker}"'}), 404
 
-    start =  datetime.datetime.now() - datetime.timedelta(days=30)
-    end =  datetime.datetime.now()
-    
-    pricing = db.Price.company(ticker=ticker, start=start, end=end)
-    price = pricing.reset_index().iloc[-1]['close'] if not pricing.empty else None
-   
-    return jsonify(
-        {
-            "ticker": c.ticker,
-            "cik": c.cik,
-            "name": c.name,
-            "sector": c.sector,
-            "logo": c.logo,
-            "description": c.description,
-            "sharesOutstanding": c.shares_outstanding,
-            "price": price,
-        }
+    refreshes.refresh_if_stale(c)
+
+    latest = db.LatestPrice.get(
+        c.ticker, since=datetime.date.today() - datetime.timedelta(days=30)
     )
+    price = latest.close if latest else None
+
+    return jsonify(company_info(c, price))
 
 
 @app.route("/api/market/<ticker>/price")
+@conditional(PRICE_DATASETS)
 def market_price(ticker):
     ticker = ticker.upper()
     args = request.args
     start = args.get("start", datetime.datetime.now() - datetime.timedelta(days=30))
     end = args.get("end", datetime.datetime.now())
+    stream = args.get("stream", None)
+
+    if stream and stream not in STREAM_FORMATS:
+        return (
+            jsonify(
+                {
+                    "error": '"stream" must be one of ["ndjson"]',
+                }
+            ),
+            400,
+        )
+
+    if stream:
+        return ndjson_response(
+            {
+                "ticker": ticker,
+                "start": start,
+                "end": end,
+                "columns": ["date", "open", "close", "high", "low", "volume"],
+            },
+            db.Price.stream_company(ticker=ticker, start=start, end=end),
+        )
 
     df = db.Price.company(ticker=ticker, start=start, end=end).reset_index()
-    df["date"] = df["date"].map(lambda x: x.isoformat())
 
-    return jsonify(
-        {
-            "ticker": ticker,
-            "start": start,
-            "end": end,
-            "columns": df.columns.tolist(),
-            "data": df.values.tolist(),
-        }
-    )
+    mimetype = negotiate_frame_format()
+    if mimetype:
+        return frame_response(df, mimetype)
+
+    with phase("serialize"):
+        return fast_jsonify(
+            {
+                "ticker": ticker,
+                "start": start,
+                "end": end,
+                "columns": df.columns.tolist(),
+                "data": frame_rows(df),
+            }
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+import datetime
+from types import SimpleNamespace
+
+from config import config
+from mongo import decode_cursor
+
+# Parsing and validation of the query parameters of the endpoints served by
+# both the Flask app and the asynchronous entry point in asgi.py. Each parser
+# takes the query parameters of a request and returns the parsed values along
+# with an error message, which is None when the parameters are valid.
+
+# The longest range the calendar endpoints serve in one request.
+MAX_CALENDAR_DAYS = 366
+
+# The most transcripts and news articles the activity endpoint returns in one
+# page each.
+MAX_ARTICLES_LIMIT = 500
+
+
+def parse_datetime(value, name):
+    """Parse `value` if it is a string, returning any other value as is."""
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value), None
+        except ValueError:
+            return None, f'"{name}" must be a valid date string i.e. "YYYY-MM-DD"'
+    return value, None
+
+
+def calendar_date(args):
+    """Return the "date" of a calendar request, today by default."""
+    date, error = parse_datetime(args.get("date", datetime.date.today()), "date")
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    return date, error
+
+
+def calendar_range(args):
+    """Return the "start" and "end" dates of a calendar range, inclusive."""
+    if "start" not in args or "end" not in args:
+        return None, '"start" and "end" are both required for a range'
+
+    bounds = []
+    for name in ["start", "end"]:
+        value, error = parse_datetime(args[name], name)
+        if error:
+            return None, error
+        bounds.append(value.date())
+
+    start, end = bounds
+    if start > end or (end - start).days >= MAX_CALENDAR_DAYS:
+        return (
+            None,
+            f'"start" must be before "end" and at most {MAX_CALENDAR_DAYS} days apart',
+        )
+
+    return (start, end), None
+
+
+def activity(args):
+    """Return the tickers, the date range, the page size and the cursors of
+    the pages of transcripts and news of an activity request."""
+    tickers = args.get("tickers", [])
+    if isinstance(tickers, str):
+        tickers = tickers.upper().split(",")
+
+    if len(tickers) < 1:
+        return None, '"tickers" is a required query parameter'
+
+    before, error = parse_datetime(args.get("before", None), "before")
+    if error:
+        return None, error
+
+    after, error = parse_datetime(
+        args.get("after", datetime.date.today() - datetime.timedelta(days=120)),
+        "after",
+    )
+    if error:
+        return None, error
+
+    try:
+        limit = int(args.get("limit", config.activity.articles_limit))
+    except ValueError:
+        return None, '"limit" must be an integer'
+
+    if limit < 1 or limit > MAX_ARTICLES_LIMIT:
+        return None, f'"limit" must be between 1 and {MAX_ARTICLES_LIMIT}'
+
+    cursors = {}
+    for name in ["transcripts", "news"]:
+        cursors[name] = args.get(f"{name}Cursor")
+        if cursors[name]:
+            try:
+                decode_cursor(cursors[name])
+            except ValueError:
+                return None, f'"{name}Cursor" is not a valid cursor'
+
+    return (
+        SimpleNamespace(
+            tickers=tickers,
+            before=before,
+            after=after,
+            limit=limit,
+            cursors=cursors,
+        ),
+        None,
+    )
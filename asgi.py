@@ -0,0 +1,176 @@
+import asyncio
+import logging
+
+import orjson
+import uvicorn
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from config import config
+from app import (
+    app as flask_app,
+    ORJSON_OPTIONS,
+    activity_payload,
+    calendar_payload,
+    calendar_range_payload,
+    orjson_default,
+)
+from instrumentation import endpoint_context, phase
+import aiodb
+import aiomongo
+import arguments
+
+# An asynchronous entry point serving the I/O bound endpoints with asyncio
+# database drivers. Every other endpoint is served by the Flask app which is
+# mounted underneath and run on a thread pool by asgiref.
+
+logger = logging.getLogger(__name__)
+
+
+def jsonify(payload, status_code=200):
+    return Response(
+        orjson.dumps(payload, default=orjson_default, option=ORJSON_OPTIONS),
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+async def gather(sources, timeout):
+    """The asynchronous counterpart of app.fan_out."""
+    outcomes = await asyncio.gather(
+        *(asyncio.wait_for(source, timeout) for source in sources.values()),
+        return_exceptions=True,
+    )
+
+    results = {}
+    partial = []
+    for name, outcome in zip(sources, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            logger.warning(f'"{name}" did not complete within {timeout}s')
+            partial.append(name)
+        elif isinstance(outcome, Exception):
+            logger.error(f'"{name}" failed', exc_info=outcome)
+            partial.append(name)
+        else:
+            results[name] = outcome
+
+    return results, partial
+
+
+async def ping(request):
+    return jsonify({"message": "pong"})
+
+
+def calendar(name, by_date, between, date_column):
+    """The asynchronous counterpart of app.calendar, recording its phases as
+    the Flask endpoint `name` does."""
+
+    async def endpoint(request):
+        with endpoint_context(name):
+            args = request.query_params
+            if "start" in args or "end" in args:
+                bounds, error = arguments.calendar_range(args)
+                if error:
+                    return jsonify({"error": error}, 400)
+
+                df = await between(*bounds)
+
+                with phase("serialize"):
+                    return jsonify(calendar_range_payload(*bounds, df, date_column))
+
+            date, error = arguments.calendar_date(args)
+            if error:
+                return jsonify({"error": error}, 400)
+
+            df = await by_date(date)
+
+            with phase("serialize"):
+                return jsonify(calendar_payload(date, df))
+
+    return endpoint
+
+
+async def activity(request):
+    with endpoint_context("activity"):
+        params, error = arguments.activity(request.query_params)
+        if error:
+            return jsonify({"error": error}, 400)
+
+        tickers, before, after = params.tickers, params.before, params.after
+
+        timeout = config.activity.timeout
+        results, partial = await gather(
+            {
+                "earnings": aiodb.earnings(
+                    tickers, before=before, after=after, timeout=timeout
+                ),
+                "splits": aiodb.splits(
+                    tickers, before=before, after=after, timeout=timeout
+                ),
+                "dividends": aiodb.dividends(
+                    tickers, before=before, after=after, timeout=timeout
+                ),
+                "congressionalTrades": aiodb.congressional_trades(
+                    tickers, before=before, after=after, timeout=timeout
+                ),
+                "articles": aiomongo.activity(
+                    tickers,
+                    before=before,
+                    after=after,
+                    limit=params.limit,
+                    cursors=params.cursors,
+                    timeout=timeout,
+                ),
+            },
+            timeout=timeout,
+        )
+
+        with phase("serialize"):
+            return jsonify(activity_payload(params, results, partial))
+
+
+app = Starlette(
+    routes=[
+        Route("/api/ping", ping),
+        Route(
+            "/api/market/earnings",
+            calendar(
+                "earnings", aiodb.earnings_by_date, aiodb.earnings_between, "date"
+            ),
+        ),
+        Route(
+            "/api/market/dividends",
+            calendar(
+                "dividends",
+                aiodb.dividends_by_date,
+                aiodb.dividends_between,
+                "ex_date",
+            ),
+        ),
+        Route(
+            "/api/market/splits",
+            calendar("splits", aiodb.splits_by_date, aiodb.splits_between, "date"),
+        ),
+        Route(
+            "/api/market/congressional_trades",
+            calendar(
+                "congressional_trades",
+                aiodb.congressional_trades_by_date,
+                aiodb.congressional_trades_between,
+                "transaction_date",
+            ),
+        ),
+        Route("/api/market/activity", activity),
+        Mount("/", WsgiToAsgi(flask_app)),
+    ]
+)
+
+
+def main():
+    uvicorn.run(app, host="0.0.0.0", port=config.port)
+
+
+if __name__ == "__main__":
+    main()
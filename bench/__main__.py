@@ -0,0 +1,160 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+import numpy as np
+
+import db
+from bench import data, load, runner
+from bench.scenarios import SCENARIOS
+
+RESULTS = os.path.join(os.path.dirname(__file__), "results")
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def universe_arguments(parser):
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", dest="chunk_size", type=int, default=10000)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    subcommand_parser = parser.add_subparsers(dest="subcommand")
+
+    load_parser = subcommand_parser.add_parser("load")
+    universe_arguments(load_parser)
+    load_parser.add_argument("--replace", action="store_true")
+
+    run_parser = subcommand_parser.add_parser("run")
+    universe_arguments(run_parser)
+    run_parser.add_argument(
+        "--mode", choices=["inprocess", "http"], default="inprocess"
+    )
+    run_parser.add_argument(
+        "--url", help="benchmark a running service instead of serving the app"
+    )
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--requests", type=int, default=200)
+    run_parser.add_argument("--warmup", type=int, default=20)
+    run_parser.add_argument(
+        "--scenario", dest="scenarios", action="append", choices=list(SCENARIOS)
+    )
+    run_parser.add_argument("--output")
+
+    compare_parser = subcommand_parser.add_parser("compare")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("result")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="largest tolerated increase in p95 latency, as a fraction",
+    )
+
+    args = parser.parse_args()
+
+    if args.subcommand == "load":
+        universe = data.generate(args.companies, args.years, args.seed)
+        if not load.is_empty():
+            if not args.replace:
+                print("The database already holds companies, pass --replace")
+                exit(1)
+            load.clear()
+        load.load(universe, chunk_size=args.chunk_size)
+
+    elif args.subcommand == "run":
+        universe = data.generate(args.companies, args.years, args.seed)
+        if load.is_empty():
+            load.load(universe, chunk_size=args.chunk_size)
+        load.use_mongo_stand_in(universe)
+
+        from app import app
+
+        if args.mode == "http":
+            url = args.url or runner.serve(app, threads=args.concurrency)
+            client = lambda: runner.HttpClient(url)
+        else:
+            client = lambda: runner.InProcessClient(app)
+
+        rng = np.random.default_rng(args.seed)
+        results = {}
+        for name in args.scenarios or list(SCENARIOS):
+            results[name] = runner.run(
+                SCENARIOS[name],
+                universe,
+                client,
+                concurrency=args.concurrency,
+                requests=args.requests,
+                warmup=args.warmup,
+                rng=rng,
+            )
+            r = results[name]
+            print(
+                f"{name:<22} {r['throughput']:>8.1f} req/s"
+                f"  p50 {r['p50_ms']:>8.1f}ms  p95 {r['p95_ms']:>8.1f}ms"
+                f"  p99 {r['p99_ms']:>8.1f}ms  errors {r['errors']}"
+            )
+
+        started = datetime.datetime.now()
+        output = args.output or os.path.join(
+            RESULTS, f"{started:%Y%m%d-%H%M%S}-{revision() or 'unknown'}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(
+                {
+                    "revision": revision(),
+                    "started": started.isoformat(),
+                    "python": platform.python_version(),
+                    "database": db.engine.dialect.name,
+                    "mode": args.mode,
+                    "url": args.url,
+                    "concurrency": args.concurrency,
+                    "universe": {
+                        "companies": args.companies,
+                        "years": args.years,
+                        "seed": args.seed,
+                        "end": universe.dates[-1].date().isoformat(),
+                    },
+                    "scenarios": results,
+                },
+                f,
+                indent=2,
+            )
+        print("Results written to", output)
+
+    elif args.subcommand == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.result) as f:
+            result = json.load(f)
+
+        regressions = runner.compare(baseline, result, args.threshold)
+        for name, change in regressions.items():
+            print(f"{name} p95 latency regressed by {change:.0%}")
+        if regressions:
+            exit(1)
+        print("No regressions")
+
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import string
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+# A synthetic market universe shaped like the data sickle harvests. The same
+# parameters and seed always generate the same universe so that results of
+# benchmark runs can be compared with each other.
+
+SECTORS = [
+    "Technology",
+    "Healthcare",
+    "Financial Services",
+    "Consumer Cyclical",
+    "Industrials",
+    "Energy",
+    "Utilities",
+    "Real Estate",
+    "Basic Materials",
+    "Communication Services",
+]
+
+WORDS = [
+    "alpha",
+    "american",
+    "atlantic",
+    "bio",
+    "capital",
+    "data",
+    "digital",
+    "energy",
+    "first",
+    "general",
+    "global",
+    "health",
+    "holdings",
+    "industries",
+    "international",
+    "micro",
+    "national",
+    "networks",
+    "pacific",
+    "power",
+    "resources",
+    "systems",
+    "technologies",
+    "therapeutics",
+    "united",
+]
+
+SUFFIXES = ["Inc", "Corp", "Co", "Group", "Ltd", "plc"]
+
+MEMBERS = 200
+AMOUNTS = [
+    "$1,001 - $15,000",
+    "$15,001 - $50,000",
+    "$50,001 - $100,000",
+    "$100,001 - $250,000",
+]
+
+NEWS_PER_YEAR = 12
+TRANSCRIPTS_PER_YEAR = 4
+NEWS_SIZE = 1024
+TRANSCRIPT_SIZE = 16 * 1024
+
+
+def generate(companies=200, years=3, seed=0, end=None):
+    """Generate `companies` companies with `years` years of daily prices up to
+    `end` (today by default) along with their earnings, dividends, splits,
+    congressional trades and articles."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+    dates = pd.bdate_range(end - pd.DateOffset(years=years), end, name="date")
+
+    tickers = _tickers(rng, companies)
+    universe = SimpleNamespace(
+        seed=seed,
+        tickers=tickers,
+        dates=dates,
+        companies=_companies(rng, tickers),
+        prices=_prices(rng, tickers, dates),
+    )
+    universe.earnings = _earnings(rng, tickers, dates)
+    universe.dividends = _dividends(rng, tickers, dates)
+    universe.splits = _splits(rng, tickers, dates)
+    universe.congressional_trades = _congressional_trades(rng, tickers, dates)
+    universe.articles = _articles(rng, tickers, dates)
+    return universe
+
+
+def _tickers(rng, n):
+    letters = np.array(list(string.ascii_uppercase))
+    tickers = set()
+    while len(tickers) < n:
+        length = rng.choice([1, 2, 3, 4, 5], p=[0.02, 0.1, 0.38, 0.4, 0.1])
+        tickers.add("".join(rng.choice(letters, length)))
+    return sorted(tickers)
+
+
+def _companies(rng, tickers):
+    names = [
+        " ".join(w.title() for w in rng.choice(WORDS, rng.integers(1, 4), False))
+        + " "
+        + rng.choice(SUFFIXES)
+        for _ in tickers
+    ]
+    return pd.DataFrame(
+        {
+            "ticker": tickers,
+            "cik": rng.choice(10**7, len(tickers), replace=False),
+            "name": names,
+            "sector": rng.choice(SECTORS, len(tickers)),
+            "description": [f"{name} is a synthetic company." for name in names],
+            "shares_outstanding": rng.integers(10**6, 10**10, len(tickers)).astype(
+                str
+            ),
+            "logo": [f"https://logo.example.com/{t.lower()}.png" for t in tickers],
+            "last_modified": pd.Timestamp.today().date(),
+        }
+    )
+
+
+def _prices(rng, tickers, dates):
+    """Daily prices following a geometric brownian motion. A tenth of the
+    symbols list part way through the window."""
+    drift = rng.normal(0.0003, 0.0002, len(tickers))
+    volatility = rng.uniform(0.01, 0.04, len(tickers))
+    returns = rng.normal(drift, volatility, (len(dates), len(tickers)))
+    close = rng.uniform(5, 500, len(tickers)) * np.exp(np.cumsum(returns, axis=0))
+
+    listed = np.where(
+        rng.random(len(tickers)) < 0.1, rng.integers(0, len(dates), len(tickers)), 0
+    )
+    mask = np.arange(len(dates))[:, None] >= listed[None, :]
+
+    spread = np.abs(rng.normal(0, volatility, close.shape)) * close
+    frame = pd.DataFrame(
+        {
+            "date": np.repeat(dates.values, len(tickers)),
+            "symbol": np.tile(tickers, len(dates)),
+            "adj_close": close.ravel(),
+            "open": (close + rng.normal(0, 0.5, close.shape) * spread).ravel(),
+            "close": close.ravel(),
+            "high": (close + spread).ravel(),
+            "low": (close - spread).ravel(),
+            "volume": rng.integers(10**4, 10**7, close.shape).astype(float).ravel(),
+        }
+    )
+    return frame[mask.ravel()].reset_index(drop=True)
+
+
+def _quarterly(rng, tickers, dates):
+    offsets = rng.integers(0, 91, len(tickers))
+    rows = []
+    for ticker, offset in zip(tickers, offsets):
+        for d in pd.date_range(
+            dates[0] + pd.Timedelta(days=int(offset)), dates[-1], freq="91D"
+        ):
+            rows.append((ticker, d))
+    return rows
+
+
+def _earnings(rng, tickers, dates):
+    rows = _quarterly(rng, tickers, dates)
+    return pd.DataFrame(
+        {"date": [d.date() for _, d in rows], "ticker": [t for t, _ in rows]}
+    )
+
+
+def _dividends(rng, tickers, dates):
+    payers = [t for t in tickers if rng.random() < 0.4]
+    rows = _quarterly(rng, payers, dates)
+    ex_dates = pd.DatetimeIndex([d for _, d in rows])
+    return pd.DataFrame(
+        {
+            "ex_date": ex_dates.date,
+            "ticker": [t for t, _ in rows],
+            "dividend_rate": rng.uniform(0.05, 2, len(rows)).round(2),
+            "record_date": (ex_dates + pd.Timedelta(days=1)).date,
+            "payment_date": (ex_dates + pd.Timedelta(days=14)).date,
+            "announcement_date": (ex_dates - pd.Timedelta(days=14)).date,
+        }
+    )
+
+
+def _splits(rng, tickers, dates):
+    splitters = [t for t in tickers if rng.random() < 0.05]
+    split_dates = pd.DatetimeIndex(rng.choice(dates, len(splitters)))
+    return pd.DataFrame(
+        {
+            "date": split_dates.date,
+            "ticker": splitters,
+            "ratio": rng.choice(["2:1", "3:1", "4:1", "1:10"], len(splitters)),
+            "execution_date": split_dates.date,
+            "announcement_date": (split_dates - pd.Timedelta(days=30)).date,
+        }
+    )
+
+
+def _congressional_trades(rng, tickers, dates):
+    n = len(tickers) * len(dates) // 126
+    members = [f"Member {i}" for i in range(MEMBERS)]
+    transaction_dates = pd.DatetimeIndex(rng.choice(dates, n))
+    frame = pd.DataFrame(
+        {
+            "transaction_date": transaction_dates.date,
+            "ticker": rng.choice(tickers, n),
+            "name": rng.choice(members, n),
+            "disclosure_date": (
+                transaction_dates + pd.to_timedelta(rng.integers(1, 45, n), unit="D")
+            ).date,
+            "body": rng.choice(["house", "senate"], n),
+            "type": rng.choice(["purchase", "sale_full", "sale_partial"], n),
+            "amount": rng.choice(AMOUNTS, n),
+            "comment": "",
+            "url": "https://disclosures.example.com/",
+        }
+    )
+    return frame.drop_duplicates(
+        subset=["transaction_date", "ticker", "name"]
+    ).reset_index(drop=True)
+
+
+def _articles(rng, tickers, dates):
+    """News articles and earnings call transcripts. Bodies are slices of one
+    random text so that generating them is cheap."""
+    text = " ".join(rng.choice(WORDS, TRANSCRIPT_SIZE // 4))
+    years = len(dates) / 252
+
+    articles = []
+    for ticker in tickers:
+        for kind, per_year, size in [
+            ("news", NEWS_PER_YEAR, NEWS_SIZE),
+            ("transcript", TRANSCRIPTS_PER_YEAR, TRANSCRIPT_SIZE),
+        ]:
+            for d in rng.choice(dates, int(per_year * years)):
+                start = int(rng.integers(0, max(len(text) - size, 1)))
+                articles.append(
+                    {
+                        "headline": f"{ticker} {kind} {pd.Timestamp(d).date()}",
+                        "date": pd.Timestamp(d).to_pydatetime(),
+                        "tags": [ticker, "transcript"]
+                        if kind == "transcript"
+                        else [ticker],
+                        "source": "synthetic",
+                        "url": f"https://news.example.com/{ticker.lower()}",
+                        "body": text[start : start + size],
+                    }
+                )
+    return articles
@@ -0,0 +1,117 @@
+from datetime import date
+
+import pandas as pd
+
+import db
+import mongo
+from config import config
+
+# Tables written by the loader, in the order they are cleared.
+MODELS = [
+    db.LatestPrice,
+    db.PriceRollup,
+    db.Price,
+    db.TrackedSymbol,
+    db.Earnings,
+    db.Dividend,
+    db.Split,
+    db.CongressionalTrade,
+    db.Company,
+]
+
+
+def is_empty():
+    with db.Session() as session:
+        return session.query(db.Company).first() is None
+
+
+def clear():
+    with db.Session() as session:
+        for model in MODELS:
+            session.query(model).delete()
+        session.commit()
+
+
+def load(universe, chunk_size=10000, log=print):
+    """Write the universe to the configured database. On Postgres prices are
+    written through Price.upsert and the rollups refreshed as sickle does. On
+    SQLite prices are appended directly and the performance endpoint falls
+    back to resampling."""
+    for name, df in [
+        ("companies", universe.companies),
+        ("earnings", universe.earnings),
+        ("dividends", universe.dividends),
+        ("splits", universe.splits),
+        ("congressional_trades", universe.congressional_trades),
+    ]:
+        log(f"Writing {len(df.index)} rows to {name}")
+        _append(df, name, chunk_size)
+
+    log(f"Writing {len(universe.prices.index)} rows to prices")
+    if db.engine.dialect.name == "postgresql":
+        db.Price.upsert(universe.prices, chunk_size=chunk_size * 5)
+        db.PriceRollup.refresh()
+    else:
+        prices = universe.prices.copy()
+        prices["date"] = prices["date"].dt.date
+        _append(prices, "prices", chunk_size)
+        _append(
+            pd.DataFrame({"symbol": universe.tickers, "added": date.today()}),
+            "tracked_symbols",
+            chunk_size,
+        )
+        db.LatestPrice.rebuild()
+
+    reset_caches()
+
+
+def _append(df, table, chunk_size):
+    df.to_sql(
+        table,
+        db.engine,
+        if_exists="append",
+        index=False,
+        chunksize=chunk_size,
+        method="multi",
+    )
+
+
+def reset_caches():
+    db.price_cache.invalidate()
+    db.company_index.invalidate()
+    db.ingestions.clear()
+    db.latest_prices.clear()
+
+
+def _union_with(in_collection, database, options):
+    from mongomock.aggregate import process_pipeline
+
+    other = database[options["coll"]].find()
+    return list(in_collection) + list(
+        process_pipeline(other, database, options.get("pipeline", []), None)
+    )
+
+
+def use_mongo_stand_in(universe):
+    """Replace the Mongo client used by the service with an in-memory
+    mongomock client holding the universe's articles."""
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit(
+            "mongomock is required for the Mongo stand-in: "
+            "pip install -r bench/requirements.txt"
+        )
+
+    # The activity timeline is read with $unionWith, which mongomock does not
+    # implement.
+    handlers = mongomock.aggregate._PIPELINE_HANDLERS
+    if not handlers.get("$unionWith"):
+        handlers["$unionWith"] = _union_with
+
+    client = mongomock.MongoClient()
+    client[config.mongo.db]["articles"].insert_many(
+        [dict(article) for article in universe.articles]
+    )
+    mongo.client = client
+    return client
@@ -0,0 +1,108 @@
+import http.client
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+class InProcessClient:
+    """Issues requests through Flask's test client, measuring the service
+    without the cost of HTTP."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path, headers=None):
+        response = self.client.get(path, headers=headers)
+        response.get_data()
+        return response.status_code
+
+
+class HttpClient:
+    """Issues requests over a persistent HTTP/1.1 connection."""
+
+    def __init__(self, url, timeout=60):
+        parts = urlsplit(url)
+        self.prefix = parts.path.rstrip("/")
+        self.connection = http.client.HTTPConnection(
+            parts.hostname, parts.port, timeout=timeout
+        )
+
+    def get(self, path, headers=None):
+        self.connection.request("GET", self.prefix + path, headers=headers or {})
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+
+def serve(app, threads):
+    """Serve the app with waitress on an ephemeral port in a background thread
+    and return its URL."""
+    from waitress.server import create_server
+
+    server = create_server(app, host="127.0.0.1", port=0, threads=threads)
+    threading.Thread(target=server.run, daemon=True).start()
+    return f"http://127.0.0.1:{server.effective_port}"
+
+
+def run(scenario, universe, client, concurrency, requests, warmup, rng):
+    """Issue `requests` requests generated by `scenario` from `concurrency`
+    threads, each with its own client created by the `client` factory, after
+    issuing `warmup` untimed requests. Returns the throughput and latency
+    percentiles."""
+    local = threading.local()
+
+    def get(request):
+        # Scenarios return a path, or a path and the headers to send with it.
+        path, headers = request if isinstance(request, tuple) else (request, None)
+        if not hasattr(local, "client"):
+            local.client = client()
+        started = perf_counter()
+        try:
+            status = local.client.get(path, headers)
+        except Exception:
+            local.__dict__.pop("client", None)
+            status = None
+        return perf_counter() - started, status
+
+    paths = [scenario(rng, universe) for _ in range(warmup + requests)]
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(get, paths[:warmup]))
+
+        started = perf_counter()
+        outcomes = list(pool.map(get, paths[warmup:]))
+        elapsed = perf_counter() - started
+
+    latencies = np.array([latency for latency, _ in outcomes]) * 1000
+    errors = sum(1 for _, status in outcomes if status is None or status >= 400)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": requests / elapsed,
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(latencies.max()),
+    }
+
+
+def compare(baseline, result, threshold):
+    """Return the scenarios whose p95 latency regressed by more than
+    `threshold` (a fraction) between two stored results."""
+    regressions = {}
+    for name, current in result["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+
+        change = current["p95_ms"] / previous["p95_ms"] - 1
+        if change > threshold:
+            regressions[name] = change
+    return regressions
@@ -0,0 +1,121 @@
+import datetime
+
+# Each scenario returns the path of a request against a random part of the
+# universe, drawn from `rng` so the sequence of requests is reproducible, or
+# the path along with the headers to send with it.
+
+
+def _tickers(rng, universe, n):
+    return ",".join(rng.choice(universe.tickers, n, replace=False))
+
+
+def _ticker(rng, universe):
+    return rng.choice(universe.tickers)
+
+
+def _date(rng, universe):
+    return universe.dates[rng.integers(len(universe.dates))].date().isoformat()
+
+
+def _ago(universe, days):
+    return (universe.dates[-1] - datetime.timedelta(days=days)).date().isoformat()
+
+
+def ping(rng, universe):
+    return "/api/ping"
+
+
+def tickers(rng, universe):
+    search = _ticker(rng, universe)[: rng.integers(1, 3)]
+    return f"/api/market/tickers?search={search}&limit=20"
+
+
+def prices(rng, universe):
+    return (
+        f"/api/market/prices?tickers={_tickers(rng, universe, 5)}"
+        f"&start={_ago(universe, 365)}"
+    )
+
+
+def prices_ndjson(rng, universe):
+    return f"{prices(rng, universe)}&stream=ndjson"
+
+
+def prices_arrow(rng, universe):
+    return prices(rng, universe), {"Accept": "application/vnd.apache.arrow.stream"}
+
+
+def market_price(rng, universe):
+    return f"/api/market/{_ticker(rng, universe)}/price?start={_ago(universe, 365)}"
+
+
+def info(rng, universe):
+    return f"/api/market/{_ticker(rng, universe)}"
+
+
+def companies(rng, universe):
+    return f"/api/market/companies?tickers={_tickers(rng, universe, 20)}"
+
+
+def performance(rng, universe):
+    return (
+        f"/api/market/performance?tickers={_tickers(rng, universe, 5)}"
+        f"&start={_ago(universe, 365)}&frequency=M"
+    )
+
+
+def earnings(rng, universe):
+    return f"/api/market/earnings?date={_date(rng, universe)}"
+
+
+def dividends(rng, universe):
+    return f"/api/market/dividends?date={_date(rng, universe)}"
+
+
+def splits(rng, universe):
+    return f"/api/market/splits?date={_date(rng, universe)}"
+
+
+def congressional_trades(rng, universe):
+    return f"/api/market/congressional_trades?date={_date(rng, universe)}"
+
+
+def _range(rng, universe, days):
+    start = universe.dates[rng.integers(len(universe.dates))]
+    end = start + datetime.timedelta(days=days - 1)
+    return f"start={start.date().isoformat()}&end={end.date().isoformat()}"
+
+
+def earnings_range(rng, universe):
+    return f"/api/market/earnings?{_range(rng, universe, 7)}"
+
+
+def dividends_range(rng, universe):
+    return f"/api/market/dividends?{_range(rng, universe, 30)}"
+
+
+def activity(rng, universe):
+    return (
+        f"/api/market/activity?tickers={_tickers(rng, universe, 3)}"
+        f"&after={_ago(universe, 120)}"
+    )
+
+
+SCENARIOS = {
+    "ping": ping,
+    "tickers": tickers,
+    "prices": prices,
+    "prices_ndjson": prices_ndjson,
+    "prices_arrow": prices_arrow,
+    "market_price": market_price,
+    "info": info,
+    "companies": companies,
+    "performance": performance,
+    "earnings": earnings,
+    "dividends": dividends,
+    "splits": splits,
+    "congressional_trades": congressional_trades,
+    "earnings_range": earnings_range,
+    "dividends_range": dividends_range,
+    "activity": activity,
+}
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pandas as pd
+
+
+class PriceCache:
+    """An in-process, per-symbol columnar cache of daily pricing data.
+
+    Each symbol is stored as a sorted array of dates alongside one float array
+    per price column, together with the [start, end) window that was loaded
+    from the database. Requests that fall inside a cached window are sliced
+    straight out of memory. Entries are evicted least recently used first once
+    the total size of the arrays exceeds `max_bytes` and expire after `ttl`
+    seconds.
+
+    Entries are tagged with the ingestion they were loaded under and only
+    served under the same tag, so that data written by other processes (i.e.
+    sickle) is picked up as soon as its ingestion is seen.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol, start, end, tag=None):
+        """Return the columns for `symbol` between [start, end) or None if the
+        window is not covered by an entry loaded under `tag`."""
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None:
+                return None
+
+            if entry.expires < time.monotonic():
+                self._remove(symbol)
+                return None
+
+            if entry.tag != tag or start < entry.start or end > entry.end:
+                return None
+
+            self._entries.move_to_end(symbol)
+
+        dates = entry.columns["date"]
+        lo = dates.searchsorted(start.to_datetime64(), side="left")
+        hi = dates.searchsorted(end.to_datetime64(), side="left")
+        return {name: values[lo:hi] for name, values in entry.columns.items()}
+
+    def window(self, symbol):
+        """Return the [start, end) window cached for `symbol` or None."""
+        with self._lock:
+            entry = self._entries.get(symbol)
+        return (entry.start, entry.end) if entry else None
+
+    def put(self, symbol, start, end, columns, tag=None):
+        # Nothing can have been recorded after the moment the data was loaded
+        # so windows reaching into the future are treated as open ended.
+        if end >= pd.Timestamp.now():
+            end = pd.Timestamp.max
+
+        nbytes = sum(values.nbytes for values in columns.values())
+        if nbytes > self.max_bytes:
+            return
+
+        entry = SimpleNamespace(
+            start=start,
+            end=end,
+            tag=tag,
+            expires=time.monotonic() + self.ttl,
+            columns=columns,
+            nbytes=nbytes,
+        )
+
+        with self._lock:
+            self._remove(symbol)
+            self._entries[symbol] = entry
+            self.size += nbytes
+
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, symbols=None):
+        """Drop the given symbols from the cache, or everything if no symbols
+        are given."""
+        with self._lock:
+            if symbols is None:
+                self._entries.clear()
+                self.size = 0
+                return
+
+            for symbol in symbols:
+                self._remove(symbol)
+
+    def _remove(self, symbol):
+        entry = self._entries.pop(symbol, None)
+        if entry is not None:
+            self.size -= entry.nbytes
+
+
+class LRUCache:
+    """A thread safe mapping holding at most `maxsize` items, evicting the
+    least recently used item first."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class TTLCache:
+    """A thread safe mapping whose items expire `ttl` seconds after they are
+    set. Holds at most `maxsize` items, dropping the oldest first."""
+
+    def __init__(self, ttl, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            if item[0] < time.monotonic():
+                del self._items[key]
+                return default
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -19,6 +19,12 @@ config = SimpleNamespace(
         user=os.environ.get("POSTGRES_USER", "root"),
         password=os.environ.get("POSTGRES_PASSWORD", "example"),
         database=os.environ.get("POSTGRES_DATABASE", "allokate"),
+        pool_size=int(os.environ.get("POSTGRES_POOL_SIZE", "5")),
+        max_overflow=int(os.environ.get("POSTGRES_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.environ.get("POSTGRES_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.environ.get("POSTGRES_POOL_RECYCLE", "-1")),
+        pool_pre_ping=os.environ.get("POSTGRES_POOL_PRE_PING", "false").lower()
+        == "true",
     ),
     mongo=SimpleNamespace(
         host=os.environ.get("MONGO_HOST", "localhost"),
@@ -26,6 +32,37 @@ config = SimpleNamespace(
         user=os.environ.get("MONGO_USER", "root"),
         password=os.environ.get("MONGO_PASSWORD", "password"),
         db=os.environ.get("MONGO_DATABASE", "allokate"),
+        max_pool_size=int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+        min_pool_size=int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+        max_idle_time_ms=int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "0")) or None,
+        wait_queue_timeout_ms=int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))
+        or None,
+        batch_size=int(os.environ.get("MONGO_BATCH_SIZE", "100")),
+    ),
+    metrics=SimpleNamespace(
+        phases=os.environ.get("PHASE_METRICS", "true").lower() == "true",
+    ),
+    activity=SimpleNamespace(
+        workers=int(os.environ.get("ACTIVITY_WORKERS", "12")),
+        timeout=float(os.environ.get("ACTIVITY_TIMEOUT", "5")),
+        articles_limit=int(os.environ.get("ACTIVITY_ARTICLES_LIMIT", "100")),
+    ),
+    refresh=SimpleNamespace(
+        max_age_days=int(os.environ.get("COMPANY_REFRESH_MAX_AGE_DAYS", "30")),
+        workers=int(os.environ.get("COMPANY_REFRESH_WORKERS", "1")),
+        rate=float(os.environ.get("COMPANY_REFRESH_RATE", "0.5")),
+        backoff=float(os.environ.get("COMPANY_REFRESH_BACKOFF", "3600")),
+    ),
+    cache=SimpleNamespace(
+        prices_max_bytes=int(
+            os.environ.get("PRICE_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+        ),
+        prices_ttl=int(os.environ.get("PRICE_CACHE_TTL", "300")),
+        companies_ttl=int(os.environ.get("COMPANY_INDEX_TTL", "600")),
+        optimizer_size=int(os.environ.get("OPTIMIZER_CACHE_SIZE", "256")),
+        ingestion_ttl=int(os.environ.get("INGESTION_CACHE_TTL", "60")),
+        calendar_ttl=int(os.environ.get("CALENDAR_CACHE_TTL", "60")),
+        latest_prices_ttl=int(os.environ.get("LATEST_PRICE_CACHE_TTL", "60")),
     ),
 )
 
@@ -1,25 +1,172 @@
+import io
 import sqlalchemy
-from sqlalchemy import Column, Integer, String, Float, Date, func, create_engine
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Float,
+    Date,
+    DateTime,
+    func,
+    create_engine,
+    select,
+)
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.inspection import inspect
 from sqlalchemy.sql import text
 import pandas as pd
 import numpy as np
-from datetime import date
+from flask import g, has_request_context
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
 
 from config import config
+from cache import PriceCache, TTLCache
+from search import CompanyIndex
+from instrumentation import InstrumentedQueuePool, phase
 
 
 if config.postgres.host:
     engine = create_engine(
-        f"postgresql://{config.postgres.user}:{config.postgres.password}@{config.postgres.host}:{config.postgres.port}/{config.postgres.database}"
+        f"postgresql://{config.postgres.user}:{config.postgres.password}@{config.postgres.host}:{config.postgres.port}/{config.postgres.database}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=config.postgres.pool_size,
+        max_overflow=config.postgres.max_overflow,
+        pool_timeout=config.postgres.pool_timeout,
+        pool_recycle=config.postgres.pool_recycle,
+        pool_pre_ping=config.postgres.pool_pre_ping,
     )
 else:
     engine = create_engine(f"sqlite:///db.sqlite")
 
 Base = declarative_base()
 
+price_cache = PriceCache(
+    max_bytes=config.cache.prices_max_bytes, ttl=config.cache.prices_ttl
+)
+
+ingestions = TTLCache(ttl=config.cache.ingestion_ttl)
+
+# The whole latest_prices snapshot, held under a single key along with the
+# ingestion it was loaded under.
+latest_prices = TTLCache(ttl=config.cache.latest_prices_ttl)
+
+# Calendar ranges within the current week, keyed by table and range.
+calendars = TTLCache(ttl=config.cache.calendar_ttl)
+
+company_index = CompanyIndex(
+    loader=lambda: Company.all(), ttl=config.cache.companies_ttl
+)
+
+PRICE_COLUMNS = ["adj_close", "open", "close", "high", "low", "volume"]
+
+
+def _bound(value):
+    """Convert a query bound to a timestamp. Strings are compared against the
+    date column as dates whereas datetimes are compared including their time."""
+    ts = pd.Timestamp(value)
+    return ts.normalize() if isinstance(value, str) else ts
+
+
+def in_current_week(start, end):
+    """Whether the range [start, end] lies within the current week, the range
+    requested most often by the calendar UI."""
+    monday = date.today() - timedelta(days=date.today().weekday())
+    return monday <= start and end <= monday + timedelta(days=6)
+
+
+def _read_calendar(name, query, start, end):
+    cacheable = in_current_week(start, end)
+    if cacheable:
+        df = calendars.get((name, start, end))
+        if df is not None:
+            return df.copy()
+
+    with Session() as session, phase("sql"):
+        df = pd.read_sql(query, session.bind)
+
+    if cacheable:
+        calendars.set((name, start, end), df.copy())
+    return df
+
+
+def _statement_timeout(session, timeout):
+    """Have Postgres cancel statements of the session's transaction that run
+    longer than `timeout` seconds, so that work abandoned by a caller that
+    stopped waiting does not keep holding a connection."""
+    if timeout and engine.dialect.name == "postgresql":
+        session.execute(
+            text("SELECT set_config('statement_timeout', :ms, true)"),
+            {"ms": str(int(timeout * 1000))},
+        )
+
+
+def _forget_ingestions(session):
+    ingestions.clear()
+
+
+def _isoformat(d):
+    return datetime.combine(d, time()).isoformat()
+
+
+class Ingestion(Base):
+    """When each dataset was last written to. Cache validators and the tags of
+    the in-process caches are derived from the most recent ingestion of the
+    datasets they depend on."""
+
+    __tablename__ = "ingestions"
+    name = Column(String(), primary_key=True, nullable=False)
+    updated_at = Column(DateTime(timezone=True))
+
+    RECORD = """INSERT INTO ingestions (name, updated_at) VALUES (:name, CURRENT_TIMESTAMP)
+        ON CONFLICT (name) DO UPDATE SET updated_at = EXCLUDED.updated_at"""
+
+    @staticmethod
+    def record(session, name):
+        """Record an ingestion of `name` as part of the session's transaction.
+        The cached ingestions are dropped once the transaction commits, so that
+        they are never reloaded from before the commit."""
+        session.execute(text(Ingestion.RECORD), {"name": name})
+        if not sqlalchemy.event.contains(session, "after_commit", _forget_ingestions):
+            sqlalchemy.event.listen(session, "after_commit", _forget_ingestions)
+
+    @staticmethod
+    def versions():
+        """Return when each dataset was last written keyed by name. They are
+        loaded once per request, so that the validator of a response and the
+        tags of the caches it is served from all agree, and are otherwise
+        cached for a short while."""
+        if has_request_context():
+            if "ingestions" not in g:
+                g.ingestions = Ingestion._versions()
+            return g.ingestions
+        return Ingestion._versions()
+
+    @staticmethod
+    def _versions():
+        versions = ingestions.get("versions")
+        if versions is None:
+            with Session() as session:
+                rows = session.query(Ingestion.name, Ingestion.updated_at).all()
+            versions = {name: updated_at for name, updated_at in rows}
+            ingestions.set("versions", versions)
+        return versions
+
+    @staticmethod
+    def latest(names=None):
+        """Return when any of the datasets `names`, or any dataset at all, was
+        last written."""
+        versions = Ingestion.versions()
+        return max(
+            (
+                updated_at
+                for name, updated_at in versions.items()
+                if updated_at and (not names or name in names)
+            ),
+            default=None,
+        )
+
 
 class Company(Base):
     __tablename__ = "companies"
@@ -54,15 +201,23 @@ class Company(Base):
             return None
 
     @staticmethod
-    def list(search=''):
+    def get_many(tickers):
+        """Return the companies with the given tickers keyed by ticker. Unknown
+        tickers are omitted."""
         with Session() as session:
-            result = (
-                session.query(Company)
-                .filter(Company.ticker.ilike("%"+search+"%"))
-                .all()
-            )
+            companies = session.query(Company).filter(Company.ticker.in_(tickers)).all()
+        return {c.ticker: c for c in companies}
+
+    @staticmethod
+    def all():
+        with Session() as session:
+            result = session.query(Company).all()
         return result
 
+    @staticmethod
+    def list(search="", limit=None):
+        return company_index.search(search, limit=limit)
+
     @staticmethod
     def upsert_basic_info(ticker, name, logo, sector, description, shares_outstanding):
         with Session() as session:
@@ -104,8 +259,50 @@ class Company(Base):
             )
 
             session.execute(statement, data)
+            Ingestion.record(session, "companies")
+            session.commit()
+
+        company_index.update(Company.get(ticker))
+
+    @staticmethod
+    def bulk_upsert_basic_info(companies):
+        """Upsert the basic info of many companies in a single statement."""
+        if not companies:
+            return
+
+        with Session() as session:
+            statement = postgresql.insert(Company).values(
+                [
+                    {
+                        "ticker": c.ticker,
+                        "name": c.name,
+                        "logo": c.logo,
+                        "sector": c.sector,
+                        "description": c.description,
+                        "shares_outstanding": c.shares_outstanding,
+                        "last_modified": date.today(),
+                    }
+                    for c in companies
+                ]
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=["ticker"],
+                set_={
+                    "name": statement.excluded.name,
+                    "logo": statement.excluded.logo,
+                    "sector": statement.excluded.sector,
+                    "description": statement.excluded.description,
+                    "shares_outstanding": statement.excluded.shares_outstanding,
+                    "last_modified": statement.excluded.last_modified,
+                },
+            )
+
+            session.execute(statement)
+            Ingestion.record(session, "companies")
             session.commit()
 
+        company_index.invalidate()
+
     @staticmethod
     def upsert_cik_info(ticker, cik, name):
         with Session() as session:
@@ -130,37 +327,49 @@ class Company(Base):
             )
 
             session.execute(statement, data)
+            Ingestion.record(session, "companies")
             session.commit()
 
-    def bulk_upsert_cik_info(companies):
+        company_index.invalidate()
+
+    @staticmethod
+    def bulk_upsert_cik_info(companies, batch_size=1000):
+        """Insert new companies and update the CIK of existing ones, writing
+        only the rows that differ from what is stored in batches of
+        `batch_size`. Names of existing companies are left untouched. Returns
+        the number of rows written."""
+        # The last entry wins when a ticker is listed more than once.
+        data = {
+            company.ticker: {
+                "ticker": company.ticker,
+                "cik": company.cik,
+                "name": company.name,
+            }
+            for company in companies
+        }
+
         with Session() as session:
-            data = []
-            for company in companies:
-                data.append(
-                    {
-                        "ticker": company.ticker,
-                        "cik": company.cik,
-                        "name": company.name,
-                    }
+            existing = dict(session.query(Company.ticker, Company.cik).all())
+            rows = [
+                row
+                for ticker, row in data.items()
+                if ticker not in existing or existing[ticker] != row["cik"]
+            ]
+
+            for i in range(0, len(rows), batch_size):
+                statement = postgresql.insert(Company).values(rows[i : i + batch_size])
+                statement = statement.on_conflict_do_update(
+                    index_elements=["ticker"],
+                    set_={"cik": statement.excluded.cik},
                 )
+                session.execute(statement)
+            Ingestion.record(session, "companies")
+            session.commit()
 
-            statement = text(
-                """INSERT INTO companies (
-                ticker,
-                cik,
-                name
-            ) VALUES (
-                :ticker,
-                :cik,
-                :name
-            ) ON CONFLICT (ticker) DO UPDATE SET 
-                cik=:cik
-            """
-            )
+        if rows:
+            company_index.invalidate()
 
-            for line in data:
-                session.execute(statement, line)
-            session.commit()
+        return len(rows)
 
 
 class Earnings(Base):
@@ -168,40 +377,70 @@ class Earnings(Base):
     date = Column(Date, primary_key=True, nullable=False)
     ticker = Column(String(), primary_key=True, nullable=False)
 
+    @staticmethod
+    def by_date_query(date):
+        return (
+            select(Earnings, Company.cik, Company.name)
+            .join(
+                Company,
+                Earnings.ticker == Company.ticker,
+            )
+            .filter(Earnings.date == date)
+            .order_by(Company.ticker)
+        )
+
     @staticmethod
     def by_date(date):
-        with Session() as session:
-            query = (
-                session.query(Earnings, Company.cik, Company.name)
-                .join(
-                    Company,
-                    Earnings.ticker == Company.ticker,
-                )
-                .filter(Earnings.date == date)
-                .order_by(Company.ticker)
+        with Session() as session, phase("sql"):
+            return pd.read_sql(Earnings.by_date_query(date), session.bind)
+
+    @staticmethod
+    def between_query(start, end):
+        return (
+            select(Earnings, Company.cik, Company.name)
+            .join(
+                Company,
+                Earnings.ticker == Company.ticker,
             )
-        return pd.read_sql(query.statement, session.bind)
+            .filter(Earnings.date >= start)
+            .filter(Earnings.date <= end)
+            .order_by(Earnings.date, Company.ticker)
+        )
 
     @staticmethod
-    def list(tickers, before=None, after=None):
-        with Session() as session:
-            query = (
-                session.query(Earnings, Company.cik, Company.name)
-                .join(
-                    Company,
-                    Earnings.ticker == Company.ticker,
-                )
-                .filter(Earnings.ticker.in_(tickers))
+    def between(start, end):
+        """Return the earnings between [start, end] in one query."""
+        return _read_calendar(
+            "earnings", Earnings.between_query(start, end), start, end
+        )
+
+    @staticmethod
+    def list_query(tickers, before=None, after=None):
+        query = (
+            select(Earnings, Company.cik, Company.name)
+            .join(
+                Company,
+                Earnings.ticker == Company.ticker,
             )
+            .filter(Earnings.ticker.in_(tickers))
+        )
 
-            if before:
-                query = query.filter(Earnings.date < before)
+        if before:
+            query = query.filter(Earnings.date < before)
 
-            if after:
-                query = query.filter(Earnings.date >= after)
+        if after:
+            query = query.filter(Earnings.date >= after)
 
-            query = query.order_by(Earnings.date)
-        return pd.read_sql(query.statement, session.bind)
+        return query.order_by(Earnings.date)
+
+    @staticmethod
+    def list(tickers, before=None, after=None, timeout=None):
+        with Session() as session, phase("sql"):
+            _statement_timeout(session, timeout)
+            return pd.read_sql(
+                Earnings.list_query(tickers, before=before, after=after),
+                session.connection(),
+            )
 
 
 class Dividend(Base):
@@ -213,40 +452,70 @@ class Dividend(Base):
     payment_date = Column(Date)
     announcement_date = Column(Date)
 
+    @staticmethod
+    def by_date_query(date):
+        return (
+            select(Dividend, Company.cik, Company.name)
+            .join(
+                Company,
+                Dividend.ticker == Company.ticker,
+            )
+            .filter(Dividend.ex_date == date)
+            .order_by(Company.ticker)
+        )
+
     @staticmethod
     def by_date(date):
-        with Session() as session:
-            query = (
-                session.query(Dividend, Company.cik, Company.name)
-                .join(
-                    Company,
-                    Dividend.ticker == Company.ticker,
-                )
-                .filter(Dividend.ex_date == date)
-                .order_by(Company.ticker)
+        with Session() as session, phase("sql"):
+            return pd.read_sql(Dividend.by_date_query(date), session.bind)
+
+    @staticmethod
+    def between_query(start, end):
+        return (
+            select(Dividend, Company.cik, Company.name)
+            .join(
+                Company,
+                Dividend.ticker == Company.ticker,
             )
-        return pd.read_sql(query.statement, session.bind)
+            .filter(Dividend.ex_date >= start)
+            .filter(Dividend.ex_date <= end)
+            .order_by(Dividend.ex_date, Company.ticker)
+        )
 
     @staticmethod
-    def list(tickers, before=None, after=None):
-        with Session() as session:
-            query = (
-                session.query(Dividend, Company.cik, Company.name)
-                .join(
-                    Company,
-                    Dividend.ticker == Company.ticker,
-                )
-                .filter(Dividend.ticker.in_(tickers))
+    def between(start, end):
+        """Return the dividends between [start, end] in one query."""
+        return _read_calendar(
+            "dividends", Dividend.between_query(start, end), start, end
+        )
+
+    @staticmethod
+    def list_query(tickers, before=None, after=None):
+        query = (
+            select(Dividend, Company.cik, Company.name)
+            .join(
+                Company,
+                Dividend.ticker == Company.ticker,
             )
+            .filter(Dividend.ticker.in_(tickers))
+        )
+
+        if before:
+            query = query.filter(Dividend.ex_date < before)
 
-            if before:
-                query = query.filter(Dividend.ex_date < before)
+        if after:
+            query = query.filter(Dividend.ex_date >= after)
 
-            if after:
-                query = query.filter(Dividend.ex_date >= after)
+        return query.order_by(Dividend.ex_date)
 
-            query = query.order_by(Dividend.ex_date)
-        return pd.read_sql(query.statement, session.bind)
+    @staticmethod
+    def list(tickers, before=None, after=None, timeout=None):
+        with Session() as session, phase("sql"):
+            _statement_timeout(session, timeout)
+            return pd.read_sql(
+                Dividend.list_query(tickers, before=before, after=after),
+                session.connection(),
+            )
 
 
 class Split(Base):
@@ -257,40 +526,68 @@ class Split(Base):
     execution_date = Column(Date)
     announcement_date = Column(Date)
 
+    @staticmethod
+    def by_date_query(date):
+        return (
+            select(Split, Company.cik, Company.name)
+            .join(
+                Company,
+                Split.ticker == Company.ticker,
+            )
+            .filter(Split.date == date)
+            .order_by(Company.ticker)
+        )
+
     @staticmethod
     def by_date(date):
-        with Session() as session:
-            query = (
-                session.query(Split, Company.cik, Company.name)
-                .join(
-                    Company,
-                    Split.ticker == Company.ticker,
-                )
-                .filter(Split.date == date)
-                .order_by(Company.ticker)
+        with Session() as session, phase("sql"):
+            return pd.read_sql(Split.by_date_query(date), session.bind)
+
+    @staticmethod
+    def between_query(start, end):
+        return (
+            select(Split, Company.cik, Company.name)
+            .join(
+                Company,
+                Split.ticker == Company.ticker,
             )
-        return pd.read_sql(query.statement, session.bind)
+            .filter(Split.date >= start)
+            .filter(Split.date <= end)
+            .order_by(Split.date, Company.ticker)
+        )
 
     @staticmethod
-    def list(tickers, before=None, after=None):
-        with Session() as session:
-            query = (
-                session.query(Split, Company.cik, Company.name)
-                .join(
-                    Company,
-                    Split.ticker == Company.ticker,
-                )
-                .filter(Split.ticker.in_(tickers))
+    def between(start, end):
+        """Return the splits between [start, end] in one query."""
+        return _read_calendar("splits", Split.between_query(start, end), start, end)
+
+    @staticmethod
+    def list_query(tickers, before=None, after=None):
+        query = (
+            select(Split, Company.cik, Company.name)
+            .join(
+                Company,
+                Split.ticker == Company.ticker,
             )
+            .filter(Split.ticker.in_(tickers))
+        )
 
-            if before:
-                query = query.filter(Split.date < before)
+        if before:
+            query = query.filter(Split.date < before)
 
-            if after:
-                query = query.filter(Split.date >= after)
+        if after:
+            query = query.filter(Split.date >= after)
 
-            query = query.order_by(Split.date)
-        return pd.read_sql(query.statement, session.bind)
+        return query.order_by(Split.date)
+
+    @staticmethod
+    def list(tickers, before=None, after=None, timeout=None):
+        with Session() as session, phase("sql"):
+            _statement_timeout(session, timeout)
+            return pd.read_sql(
+                Split.list_query(tickers, before=before, after=after),
+                session.connection(),
+            )
 
 
 class CongressionalTrade(Base):
@@ -305,43 +602,142 @@ class CongressionalTrade(Base):
     comment = Column(String)
     url = Column(String)
 
+    @staticmethod
+    def by_date_query(date):
+        return (
+            select(CongressionalTrade, Company.cik, Company.name)
+            .join(
+                Company,
+                CongressionalTrade.ticker == Company.ticker,
+            )
+            .filter(CongressionalTrade.transaction_date == date)
+            .order_by(Company.ticker)
+        )
+
     @staticmethod
     def by_date(date):
-        with Session() as session:
-            query = (
-                session.query(CongressionalTrade, Company.cik, Company.name)
-                .join(
-                    CongressionalTrade,
-                    CongressionalTrade.ticker == Company.ticker,
-                )
-                .filter(CongressionalTrade.transaction_date == date)
-                .order_by(Company.ticker)
+        with Session() as session, phase("sql"):
+            return pd.read_sql(CongressionalTrade.by_date_query(date), session.bind)
+
+    @staticmethod
+    def between_query(start, end):
+        return (
+            select(CongressionalTrade, Company.cik, Company.name)
+            .join(
+                Company,
+                CongressionalTrade.ticker == Company.ticker,
             )
-        return pd.read_sql(query.statement, session.bind)
+            .filter(CongressionalTrade.transaction_date >= start)
+            .filter(CongressionalTrade.transaction_date <= end)
+            .order_by(CongressionalTrade.transaction_date, Company.ticker)
+        )
 
     @staticmethod
-    def list(tickers, before=None, after=None, body=None):
+    def between(start, end):
+        """Return the congressional trades between [start, end] in one query."""
+        return _read_calendar(
+            "congressional_trades",
+            CongressionalTrade.between_query(start, end),
+            start,
+            end,
+        )
+
+    @staticmethod
+    def list_query(tickers, before=None, after=None, body=None):
+        query = (
+            select(CongressionalTrade, Company.cik, Company.name)
+            .join(
+                Company,
+                CongressionalTrade.ticker == Company.ticker,
+            )
+            .filter(CongressionalTrade.ticker.in_(tickers))
+        )
+
+        if before:
+            query = query.filter(CongressionalTrade.transaction_date < before)
+
+        if after:
+            query = query.filter(CongressionalTrade.transaction_date >= after)
+
+        if body:
+            query = query.filter(CongressionalTrade.body == body)
+
+        return query.order_by(CongressionalTrade.transaction_date)
+
+    @staticmethod
+    def list(tickers, before=None, after=None, body=None, timeout=None):
+        with Session() as session, phase("sql"):
+            _statement_timeout(session, timeout)
+            return pd.read_sql(
+                CongressionalTrade.list_query(
+                    tickers, before=before, after=after, body=body
+                ),
+                session.connection(),
+            )
+
+
+class TrackedSymbol(Base):
+    """The universe of symbols whose prices are kept up to date by sickle."""
+
+    __tablename__ = "tracked_symbols"
+    symbol = Column(String(), primary_key=True, nullable=False)
+    added = Column(Date)
+
+    @staticmethod
+    def list():
         with Session() as session:
-            query = (
-                session.query(CongressionalTrade, Company.cik, Company.name)
-                .join(
-                    Company,
-                    CongressionalTrade.ticker == Company.ticker,
-                )
-                .filter(CongressionalTrade.ticker.in_(tickers))
+            rows = (
+                session.query(TrackedSymbol.symbol).order_by(TrackedSymbol.symbol).all()
             )
+        return [r[0] for r in rows]
 
-            if before:
-                query = query.filter(CongressionalTrade.transaction_date < before)
+    @staticmethod
+    def add(symbols):
+        if not symbols:
+            return
 
-            if after:
-                query = query.filter(CongressionalTrade.transaction_date >= after)
+        with Session() as session:
+            statement = (
+                postgresql.insert(TrackedSymbol)
+                .values([{"symbol": s, "added": date.today()} for s in symbols])
+                .on_conflict_do_nothing(index_elements=["symbol"])
+            )
+            session.execute(statement)
+            session.commit()
 
-            if body:
-                query = query.filter(CongressionalTrade.body == body)
+    @staticmethod
+    def remove(symbols):
+        with Session() as session:
+            session.query(TrackedSymbol).filter(
+                TrackedSymbol.symbol.in_(symbols)
+            ).delete(synchronize_session=False)
+            session.commit()
 
-            query = query.order_by(CongressionalTrade.transaction_date)
-        return pd.read_sql(query.statement, session.bind)
+    @staticmethod
+    def sync_from_transactions():
+        """Track every symbol found in the transactions table. This is how the
+        universe used to be determined and is useful for seeding the table."""
+        with Session() as session:
+            session.execute(
+                """INSERT INTO tracked_symbols (symbol, added)
+                SELECT DISTINCT symbol, CURRENT_DATE FROM transactions
+                WHERE symbol IS NOT NULL
+                ON CONFLICT (symbol) DO NOTHING"""
+            )
+            session.commit()
+
+    @staticmethod
+    def sync_from_prices():
+        """Track every symbol found in the prices table, which is how databases
+        that predate tracked_symbols are seeded."""
+        with Session() as session:
+            session.execute(
+                """INSERT INTO tracked_symbols (symbol, added)
+                SELECT DISTINCT symbol, CURRENT_DATE FROM prices
+                WHERE symbol IS NOT NULL
+                ON CONFLICT (symbol) DO NOTHING"""
+            )
+            session.commit()
 
 
 class Price(Base):
@@ -357,46 +753,180 @@ class Price(Base):
 
     @staticmethod
     def get(tickers, start, end):
+        """Return the forward filled closes of the tickers between [start, end)
+        with one column per ticker. Closes before a ticker's first price are
+        NaN."""
+        columns = Price._cached(tickers, _bound(start), _bound(end))
+
+        with phase("frame"):
+            series = {
+                symbol: pd.Series(c["close"], index=pd.DatetimeIndex(c["date"]))
+                for symbol, c in sorted(columns.items())
+                if len(c["date"])
+            }
+            df = pd.DataFrame(series).sort_index() if series else pd.DataFrame()
+            df.index = pd.DatetimeIndex(df.index, name="date")
+            df.columns = pd.Index(df.columns, name="symbol")
+
+            return df.ffill()
+
+    @staticmethod
+    def company(ticker, start, end):
+        c = Price._cached([ticker], _bound(start), _bound(end))[ticker]
+
+        with phase("frame"):
+            df = pd.DataFrame(
+                {name: c[name] for name in ["open", "close", "high", "low", "volume"]},
+                index=pd.DatetimeIndex(c["date"], name="date"),
+            )
 
+            return df.ffill()
+
+    @staticmethod
+    def _cached(tickers, start, end):
+        """Return the cached columns for each ticker between [start, end),
+        loading any symbols that are missing from the cache in one query.
+        Entries are tagged with the prices ingestion seen before loading them,
+        so that an entry is never newer than its tag."""
+        tag = Ingestion.latest(["prices"])
+        columns = {}
+        missing = []
+        for ticker in tickers:
+            c = price_cache.get(ticker, start, end, tag=tag)
+            if c is None:
+                missing.append(ticker)
+            else:
+                columns[ticker] = c
+
+        if not missing:
+            return columns
+
+        # Widen the window to cover what is already cached so a reload never
+        # shrinks an existing entry.
+        load_start, load_end = start, end
+        for ticker in missing:
+            window = price_cache.window(ticker)
+            if window:
+                load_start = min(load_start, window[0])
+                load_end = max(load_end, window[1])
+
+        loaded = Price._load(missing, load_start, load_end)
+        lo, hi = start.to_datetime64(), end.to_datetime64()
+        for ticker in missing:
+            c = loaded[ticker]
+            price_cache.put(ticker, load_start, load_end, c, tag=tag)
+
+            dates = c["date"]
+            i, j = dates.searchsorted(lo), dates.searchsorted(hi)
+            columns[ticker] = {name: values[i:j] for name, values in c.items()}
+
+        return columns
+
+    @staticmethod
+    def _load(tickers, start, end):
         with Session() as session:
-            results = pd.read_sql(
+            query = (
                 session.query(Price)
                 .filter(Price.symbol.in_(tickers))
-                .filter(Price.date >= start)
-                .filter(Price.date < end)
-                .statement,
-                session.bind,
+                .filter(Price.date >= start.to_pydatetime())
             )
-        results["symbol"].dropna().to_list()
+
+            if end < pd.Timestamp.max:
+                query = query.filter(Price.date < end.to_pydatetime())
+
+            query = query.order_by(Price.symbol, Price.date)
+            with phase("sql"):
+                results = pd.read_sql(query.statement, session.bind)
 
         results["date"] = pd.to_datetime(results["date"])
 
-        return (
-            results.set_index("date")
-            .pivot(columns="symbol", values="close")
-            .ffill()
-            .replace({np.nan: None})
-        )
+        columns = {}
+        for symbol, rows in results.groupby("symbol", sort=False):
+            columns[symbol] = {"date": rows["date"].to_numpy()}
+            for name in PRICE_COLUMNS:
+                columns[symbol][name] = rows[name].to_numpy(dtype="float64")
+
+        for ticker in tickers:
+            if ticker not in columns:
+                columns[ticker] = {
+                    "date": np.empty(0, dtype="datetime64[ns]"),
+                    **{name: np.empty(0, dtype="float64") for name in PRICE_COLUMNS},
+                }
+
+        return columns
 
     @staticmethod
-    def company(ticker, start, end):
+    def stream(tickers, start, end, chunk_size=1000):
+        """Stream the forward filled closing prices of the given tickers in
+        date order, yielding chunks of at most `chunk_size` rows of the form
+        [date, close, ...] with one close per ticker in sorted order."""
+        symbols = sorted(set(tickers))
+        position = {symbol: i for i, symbol in enumerate(symbols)}
+        row = [None] * len(symbols)
+        current = None
+        chunk = []
 
         with Session() as session:
-            results = pd.read_sql(
-                session.query(Price)
-                .filter(Price.symbol == ticker)
-                .filter(Price.date >= start)
-                .filter(Price.date < end)
-                .statement,
-                session.bind,
+            query = (
+                session.query(Price.date, Price.symbol, Price.close)
+                .filter(Price.symbol.in_(symbols))
+                .filter(Price.date >= _bound(start).to_pydatetime())
+                .filter(Price.date < _bound(end).to_pydatetime())
+                .order_by(Price.date, Price.symbol)
+                .yield_per(chunk_size)
             )
-        results["symbol"].dropna().to_list()
 
-        results["date"] = pd.to_datetime(results["date"])
+            for d, symbol, close in query:
+                if d != current:
+                    if current is not None:
+                        chunk.append([_isoformat(current), *row])
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                    current = d
 
-        results.drop(columns=["symbol", "adj_close"], inplace=True)
+                if close is not None:
+                    row[position[symbol]] = close
 
-        return results.set_index("date").ffill().replace({np.nan: None})
+        if current is not None:
+            chunk.append([_isoformat(current), *row])
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def stream_company(ticker, start, end, chunk_size=1000):
+        """Stream the forward filled prices of a single ticker in date order,
+        yielding chunks of at most `chunk_size` rows of the form
+        [date, open, close, high, low, volume]."""
+        row = [None] * 5
+        chunk = []
+
+        with Session() as session:
+            query = (
+                session.query(
+                    Price.date,
+                    Price.open,
+                    Price.close,
+                    Price.high,
+                    Price.low,
+                    Price.volume,
+                )
+                .filter(Price.symbol == ticker)
+                .filter(Price.date >= _bound(start).to_pydatetime())
+                .filter(Price.date < _bound(end).to_pydatetime())
+                .order_by(Price.date)
+                .yield_per(chunk_size)
+            )
+
+            for d, *values in query:
+                row = [v if v is not None else row[i] for i, v in enumerate(values)]
+                chunk.append([_isoformat(d), *row])
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+
+        if chunk:
+            yield chunk
 
     @staticmethod
     def on(tickers, date):
@@ -411,47 +941,117 @@ class Price(Base):
         return results
 
     @staticmethod
-    def upsert(prices, init=False):
+    def dump(start, end):
+        """Return every row of the prices table between [start, end)."""
+        with Session() as session:
+            results = pd.read_sql(
+                session.query(Price)
+                .filter(Price.date >= start)
+                .filter(Price.date < end)
+                .statement,
+                session.bind,
+            )
+        return results
+
+    @staticmethod
+    def upsert(prices, init=False, chunk_size=50000, log=None):
+        """Write prices to the database in chunks of `chunk_size` rows. Each
+        chunk is copied into a temporary staging table with COPY and merged
+        into prices with a single upsert, in a transaction of its own which
+        also updates the latest prices of the chunk's symbols. When `init` is
+        set the prices table is emptied first. Progress is reported through
+        `log`, if given."""
         # Convert column names to snake case.
-        print(prices)
         prices = prices.reset_index()
         prices.columns = prices.columns.str.lower().str.replace(" ", "_")
         prices.date = prices.date.dt.date
-        if init:
-            with Session() as session:
-                prices.to_sql(
-                    "prices",
-                    index=False,
-                    con=session.connection(),
-                    if_exists="replace" if init else "append",
+        prices = prices.drop_duplicates(subset=["date", "symbol"], keep="last")
+
+        # get list of fields making up primary key
+        primary_keys = [key.name for key in inspect(Price).primary_key]
+        columns = [c.name for c in Price.__table__.columns if c.name in prices]
+        updates = [c for c in columns if c not in primary_keys]
+
+        merge = f"""INSERT INTO prices ({", ".join(columns)})
+            SELECT {", ".join(columns)} FROM prices_staging
+            ON CONFLICT ({", ".join(primary_keys)}) DO UPDATE SET
+                {", ".join(f"{c}=EXCLUDED.{c}" for c in updates)}
+        """
+
+        started = perf_counter()
+        written = 0
+        for i in range(0, len(prices.index), chunk_size):
+            chunk = prices.iloc[i : i + chunk_size]
+
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, columns=columns, header=False, index=False)
+            buffer.seek(0)
+
+            # Each chunk checks out a connection and commits on it. The staging
+            # table is temporary and so created on whichever connection that is.
+            with Session.begin() as session:
+                cursor = session.connection().connection.cursor()
+                cursor.execute(
+                    """CREATE TEMP TABLE IF NOT EXISTS prices_staging
+                    (LIKE prices INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"""
                 )
-                session.commit()
-        else:
-            with Session() as session:
-                # get list of fields making up primary key
-                primary_keys = [key.name for key in inspect(Price).primary_key]
+                if init and i == 0:
+                    cursor.execute("TRUNCATE prices, latest_prices")
 
-                values = prices.to_dict(orient="records")
-                stmt = postgresql.insert(Price).values(values)
-
-                # define dict of non-primary keys for updating
-                update_dict = {c.name: c for c in stmt.excluded if not c.primary_key}
-
-                update_stmt = stmt.on_conflict_do_update(
-                    index_elements=primary_keys,
-                    set_=update_dict,
+                cursor.copy_expert(
+                    f"COPY prices_staging ({', '.join(columns)}) FROM STDIN WITH CSV",
+                    buffer,
+                )
+                cursor.execute(merge)
+                cursor.execute(
+                    """INSERT INTO tracked_symbols (symbol, added)
+                    SELECT DISTINCT symbol, CURRENT_DATE FROM prices_staging
+                    ON CONFLICT (symbol) DO NOTHING"""
+                )
+                cursor.execute(LatestPrice.MERGE)
+                Ingestion.record(session, "prices")
+                Ingestion.record(session, "latest_prices")
+
+            written += len(chunk.index)
+            if log:
+                elapsed = perf_counter() - started
+                log(
+                    f"{written}/{len(prices.index)} prices written "
+                    f"({written / elapsed:.0f} rows/s)"
                 )
 
-                session.execute(update_stmt)
-                session.commit()
+        price_cache.invalidate(None if init else prices.symbol.unique())
+        latest_prices.clear()
 
     @staticmethod
     def tickers():
+        """Return the tracked symbols. An empty tracked_symbols table, as
+        created on a database that predates it, is first seeded with every
+        symbol with prices."""
+        tickers = TrackedSymbol.list()
+        if not tickers:
+            TrackedSymbol.sync_from_prices()
+            tickers = TrackedSymbol.list()
+        return tickers
+
+    @staticmethod
+    def most_recent_dates(symbols):
+        """Return the most recent date with prices for each of the symbols in
+        a single grouped query. Symbols without any prices are omitted."""
         with Session() as session:
-            rows = session.execute("SELECT DISTINCT(symbol) FROM transactions;")
-        list = [r[0] for r in rows]
-        list.remove(None)
-        return list
+            rows = (
+                session.query(Price.symbol, func.max(Price.date))
+                .filter(Price.symbol.in_(symbols))
+                .group_by(Price.symbol)
+                .all()
+            )
+        return dict(rows)
+
+    @staticmethod
+    def earliest_date():
+        with Session() as session:
+            result = session.query(func.min(Price.date)).one()
+        return result[0]
 
     @staticmethod
     def most_recent_date(symbol=None):
@@ -463,6 +1063,207 @@ class Price(Base):
         return result[0]
 
 
+class LatestPrice(Base):
+    """The most recent close of each symbol along with the change from the
+    close before it. Maintained by Price.upsert in the same transaction as the
+    prices it is derived from."""
+
+    __tablename__ = "latest_prices"
+    symbol = Column(String(), primary_key=True, nullable=False)
+    date = Column(Date)
+    close = Column(Float())
+    previous_close = Column(Float())
+    change = Column(Float())
+
+    SNAPSHOT = """INSERT INTO latest_prices
+            (symbol, date, close, previous_close, change)
+        SELECT symbol, date, close, previous_close, close - previous_close
+        FROM (
+            SELECT symbol, date, close,
+                LAG(close) OVER (PARTITION BY symbol ORDER BY date)
+                    AS previous_close,
+                ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY date DESC)
+                    AS position
+            FROM prices
+            WHERE close IS NOT NULL {symbols}
+        ) AS ranked
+        WHERE position = 1
+        ON CONFLICT (symbol) DO UPDATE SET
+            date = EXCLUDED.date,
+            close = EXCLUDED.close,
+            previous_close = EXCLUDED.previous_close,
+            change = EXCLUDED.change"""
+
+    # Merges the latest close of each symbol in prices_staging. The close
+    # before it comes from the staged rows when there are several, or else
+    # from the row it replaces, so no symbol's history is read again.
+    PREVIOUS_CLOSE = """COALESCE(EXCLUDED.previous_close, CASE
+            WHEN EXCLUDED.date > latest_prices.date THEN latest_prices.close
+            ELSE latest_prices.previous_close
+        END)"""
+    MERGE = f"""INSERT INTO latest_prices
+            (symbol, date, close, previous_close, change)
+        SELECT DISTINCT ON (symbol)
+            symbol, date, close, previous_close, close - previous_close
+        FROM (
+            SELECT symbol, date, close,
+                LAG(close) OVER (PARTITION BY symbol ORDER BY date)
+                    AS previous_close
+            FROM prices_staging
+            WHERE close IS NOT NULL
+        ) AS staged
+        ORDER BY symbol, date DESC
+        ON CONFLICT (symbol) DO UPDATE SET
+            date = EXCLUDED.date,
+            close = EXCLUDED.close,
+            previous_close = {PREVIOUS_CLOSE},
+            change = EXCLUDED.close - {PREVIOUS_CLOSE}
+        WHERE EXCLUDED.date >= latest_prices.date"""
+
+    @staticmethod
+    def get(symbol, since=None):
+        return LatestPrice.get_many([symbol], since=since).get(symbol)
+
+    @staticmethod
+    def get_many(symbols, since=None):
+        """Return the latest prices of the symbols keyed by symbol from the
+        snapshot held in memory. Symbols without a close on or after `since`
+        are omitted."""
+        snapshot = LatestPrice._snapshot()
+        latest = {}
+        for symbol in symbols:
+            row = snapshot.get(symbol)
+            if row is not None and (since is None or row.date >= since):
+                latest[symbol] = row
+        return latest
+
+    @staticmethod
+    def _snapshot():
+        tag = Ingestion.latest(["prices", "latest_prices"])
+        cached = latest_prices.get("snapshot")
+        if cached is not None and cached[0] == tag:
+            return cached[1]
+
+        with Session() as session:
+            rows = session.query(LatestPrice).all()
+        snapshot = {row.symbol: row for row in rows}
+        latest_prices.set("snapshot", (tag, snapshot))
+        return snapshot
+
+    @staticmethod
+    def rebuild():
+        """Rebuild the snapshot from the whole prices table."""
+        with Session() as session:
+            session.query(LatestPrice).delete()
+            session.execute(text(LatestPrice.SNAPSHOT.format(symbols="")))
+            Ingestion.record(session, "latest_prices")
+            session.commit()
+        latest_prices.clear()
+
+
+class PriceRollup(Base):
+    """Period end closing prices of each symbol, materialized by sickle for
+    each of the FREQUENCIES. Periods are labelled the same way pandas labels
+    resampled periods i.e. weeks end on Sunday and months on their last day.
+    Daily closes are read from prices directly."""
+
+    __tablename__ = "price_rollups"
+    frequency = Column(String(), primary_key=True, nullable=False)
+    symbol = Column(String(), primary_key=True, nullable=False)
+    date = Column(Date, primary_key=True, nullable=False)
+    close = Column(Float())
+
+    FREQUENCIES = ["W", "M"]
+
+    @staticmethod
+    def label(d, frequency):
+        """Return the label of the period containing `d`."""
+        return pd.Timestamp(d).to_period(frequency).end_time.normalize()
+
+    @staticmethod
+    def get(tickers, frequency, start, end):
+        """Return the period end closes between the period labels [start, end]
+        with one column per ticker."""
+        with Session() as session, phase("sql"):
+            results = pd.read_sql(
+                session.query(PriceRollup.date, PriceRollup.symbol, PriceRollup.close)
+                .filter(PriceRollup.frequency == frequency)
+                .filter(PriceRollup.symbol.in_(tickers))
+                .filter(PriceRollup.date >= start)
+                .filter(PriceRollup.date <= end)
+                .statement,
+                session.bind,
+            )
+
+        results["date"] = pd.to_datetime(results["date"])
+
+        return results.pivot(index="date", columns="symbol", values="close")
+
+    @staticmethod
+    def refresh(symbols=None, since=None, batch_size=200):
+        """Recompute the rollups of `symbols`, or of every symbol with prices,
+        for every period from the one containing `since` onwards. Symbols are
+        processed `batch_size` at a time to bound memory."""
+        with Session() as session:
+            if symbols is None:
+                symbols = [r[0] for r in session.query(Price.symbol).distinct()]
+
+        # Periods are recomputed whole. Loading from the preceding month also
+        # covers a week that started before the month containing `since`.
+        load_from = None
+        if since is not None:
+            load_from = (pd.Timestamp(since).to_period("M") - 1).start_time
+
+        symbols = sorted(symbols)
+        for i in range(0, len(symbols), batch_size):
+            batch = symbols[i : i + batch_size]
+
+            with Session() as session:
+                query = (
+                    session.query(Price.date, Price.symbol, Price.close)
+                    .filter(Price.symbol.in_(batch))
+                    .filter(Price.close != None)
+                )
+                if load_from is not None:
+                    query = query.filter(Price.date >= load_from.to_pydatetime())
+                daily = pd.read_sql(query.statement, session.bind)
+
+            daily["date"] = pd.to_datetime(daily["date"])
+            closes = daily.pivot(index="date", columns="symbol", values="close")
+
+            rows = []
+            for frequency in PriceRollup.FREQUENCIES:
+                period = closes.resample(frequency).last()
+                df = period.stack().rename("close").reset_index()
+                df["frequency"] = frequency
+
+                if since is not None:
+                    df = df[df["date"] >= PriceRollup.label(since, frequency)]
+
+                rows.append(df)
+
+            PriceRollup._upsert(pd.concat(rows))
+
+    @staticmethod
+    def _upsert(df, batch_size=5000):
+        df = df.astype(object).where(df.notna(), None)
+        df["date"] = df["date"].map(lambda d: d.date())
+        values = df.to_dict(orient="records")
+
+        with Session() as session:
+            for i in range(0, len(values), batch_size):
+                statement = postgresql.insert(PriceRollup).values(
+                    values[i : i + batch_size]
+                )
+                statement = statement.on_conflict_do_update(
+                    index_elements=["frequency", "symbol", "date"],
+                    set_={"close": statement.excluded.close},
+                )
+                session.execute(statement)
+            Ingestion.record(session, "price_rollups")
+            session.commit()
+
+
 def init():
     Base.metadata.create_all(engine)
     with engine.begin() as connection:
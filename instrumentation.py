@@ -0,0 +1,222 @@
+import contextlib
+import contextvars
+import functools
+import threading
+from time import perf_counter
+from types import SimpleNamespace
+
+from flask import has_request_context, request
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+from sqlalchemy.pool import QueuePool
+
+# Metrics are created by register_pool_metrics against the registry of the
+# service's PrometheusMetrics instance. Until then recording is a no-op so
+# that scripts sharing db and mongo, such as sickle, are unaffected.
+pool_metrics = SimpleNamespace(sql_wait=None, mongo=None)
+phase_metrics = SimpleNamespace(seconds=None)
+
+_disabled = contextlib.nullcontext()
+# The endpoint phases are attributed to when they are recorded outside of a
+# Flask request context. A context variable rather than a thread local so that
+# it also follows asyncio tasks.
+_endpoint = contextvars.ContextVar("endpoint", default=None)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A QueuePool recording how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        if pool_metrics.sql_wait is None:
+            return super()._do_get()
+
+        started = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.sql_wait.observe(perf_counter() - started)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Counts the open and checked out connections of a MongoClient's pools
+    and records how long checkouts wait for a connection."""
+
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self._lock = threading.Lock()
+        self._started = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        self._started.value = perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait()
+        if pool_metrics.mongo:
+            pool_metrics.mongo.failures.labels(reason=str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        self._observe_wait()
+        with self._lock:
+            self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def _observe_wait(self):
+        started = getattr(self._started, "value", None)
+        self._started.value = None
+        if started is not None and pool_metrics.mongo:
+            pool_metrics.mongo.wait.observe(perf_counter() - started)
+
+
+mongo_pool_listener = MongoPoolListener()
+
+
+def register_pool_metrics(registry, engine):
+    """Export the state of the SQLAlchemy engine's pool and the Mongo client's
+    pools through `registry`."""
+    if isinstance(engine.pool, QueuePool):
+        Gauge(
+            "market_sql_pool_size",
+            "Number of connections the SQL pool keeps open",
+            registry=registry,
+        ).set_function(lambda: engine.pool.size())
+        Gauge(
+            "market_sql_pool_checked_out",
+            "Number of SQL connections currently checked out",
+            registry=registry,
+        ).set_function(lambda: engine.pool.checkedout())
+        Gauge(
+            "market_sql_pool_overflow",
+            "Number of SQL connections open beyond the pool size",
+            registry=registry,
+        ).set_function(lambda: max(engine.pool.overflow(), 0))
+        pool_metrics.sql_wait = Histogram(
+            "market_sql_pool_wait_seconds",
+            "Time spent waiting to check out a SQL connection",
+            registry=registry,
+        )
+
+    Gauge(
+        "market_mongo_pool_connections",
+        "Number of open Mongo connections",
+        registry=registry,
+    ).set_function(lambda: mongo_pool_listener.open)
+    Gauge(
+        "market_mongo_pool_checked_out",
+        "Number of Mongo connections currently checked out",
+        registry=registry,
+    ).set_function(lambda: mongo_pool_listener.checked_out)
+    pool_metrics.mongo = SimpleNamespace(
+        wait=Histogram(
+            "market_mongo_pool_wait_seconds",
+            "Time spent waiting to check out a Mongo connection",
+            registry=registry,
+        ),
+        failures=Counter(
+            "market_mongo_pool_checkout_failures",
+            "Number of failed Mongo connection checkouts",
+            ["reason"],
+            registry=registry,
+        ),
+    )
+
+
+def register_phase_metrics(registry):
+    """Export the time spent in each phase of a request through `registry`."""
+    phase_metrics.seconds = Histogram(
+        "market_request_phase_seconds",
+        "Time spent in each phase of handling a request",
+        ["endpoint", "phase"],
+        registry=registry,
+    )
+
+
+class _Phase:
+    __slots__ = ["name", "started"]
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        phase_metrics.seconds.labels(current_endpoint(), self.name).observe(
+            perf_counter() - self.started
+        )
+
+
+def phase(name):
+    """Time the enclosed block as the phase `name` of the current request i.e.
+
+    with phase("sql"):
+        df = pd.read_sql(query, session.bind)
+
+    Returns a shared no-op context unless phase metrics are registered."""
+    if phase_metrics.seconds is None:
+        return _disabled
+    return _Phase(name)
+
+
+def current_endpoint():
+    endpoint = _endpoint.get()
+    if endpoint:
+        return endpoint
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return "none"
+
+
+def bind_endpoint(fn):
+    """Attribute the phases `fn` records to the current endpoint when it is run
+    on another thread, such as those of the activity executor."""
+    if phase_metrics.seconds is None:
+        return fn
+
+    endpoint = current_endpoint()
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        with endpoint_context(endpoint):
+            return fn(*args, **kwargs)
+
+    return bound
+
+
+@contextlib.contextmanager
+def endpoint_context(endpoint):
+    """Attribute the phases recorded within the block, including those of the
+    asyncio tasks it starts, to `endpoint`. Used by the handlers of asgi.py,
+    which are served outside of Flask."""
+    token = _endpoint.set(endpoint)
+    try:
+        yield
+    finally:
+        _endpoint.reset(token)
@@ -1,67 +1,216 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime, date
-from pymongo import MongoClient
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient
 
 from config import config
+from instrumentation import mongo_pool_listener, phase
+
+uri = f"mongodb://{config.mongo.user}:{config.mongo.password}@{config.mongo.host}:{config.mongo.port}"
 
 client = MongoClient(
-    f"mongodb://{config.mongo.user}:{config.mongo.password}@{config.mongo.host}:{config.mongo.port}",
+    uri,
     document_class=dict,
     tz_aware=False,
     connect=True,
+    maxPoolSize=config.mongo.max_pool_size,
+    minPoolSize=config.mongo.min_pool_size,
+    maxIdleTimeMS=config.mongo.max_idle_time_ms,
+    waitQueueTimeoutMS=config.mongo.wait_queue_timeout_ms,
+    event_listeners=[mongo_pool_listener],
 )
 
 
-class Articles:
-    @staticmethod
-    def transcripts(tickers, before=None, after=None):
+# The fields of an article shown on the activity timeline. Article bodies,
+# entire transcripts in particular, are never read for the timeline.
+TIMELINE_PROJECTION = {"headline": 1, "date": 1, "tags": 1}
 
-        if before and isinstance(before, date):
-            before = datetime(before.year, before.month, before.day)
-        if after and isinstance(after, date):
-            after = datetime(after.year, after.month, after.day)
+# Newest first, with ties broken by _id so that pages never overlap.
+TIMELINE_SORT = [("date", DESCENDING), ("_id", DESCENDING)]
 
-        query = {'$and' : [{"tags": "transcript"}, {"tags": {"$in": tickers}}]}
 
-        if before:
-            if "date" not in query:
-                query["date"] = {}
-            query["date"]["$lt"] = (
-                datetime.fromisoformat(before) if isinstance(before, str) else before
-            )
-        if after:
-            if "date" not in query:
-                query["date"] = {}
-            query["date"]["$gte"] = (
-                datetime.fromisoformat(after) if isinstance(after, str) else after
-            )
+def encode_cursor(article):
+    """Return an opaque cursor for the page of articles following `article`."""
+    return urlsafe_b64encode(
+        f"{article['date'].isoformat()}|{article['_id']}".encode()
+    ).decode()
+
+
+def decode_cursor(cursor):
+    """Return the date and _id of the last article of the previous page.
+    Raises ValueError when the cursor is malformed."""
+    try:
+        d, _id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(d), ObjectId(_id)
+    except Exception as e:
+        raise ValueError(f'invalid cursor "{cursor}"') from e
+
+
+def after_cursor(query, cursor=None):
+    """Restrict a timeline query to the articles following `cursor`."""
+    if not cursor:
+        return query
+
+    d, _id = decode_cursor(cursor)
+    return {
+        "$and": [
+            query,
+            {"$or": [{"date": {"$lt": d}}, {"date": d, "_id": {"$lt": _id}}]},
+        ]
+    }
+
+
+def paginate(articles, limit=None):
+    """Split the result of a query for `limit` + 1 articles into the page and
+    the cursor of the next page, which is None on the last page."""
+    if limit and len(articles) > limit:
+        articles = articles[:limit]
+        return articles, encode_cursor(articles[-1])
+    return articles, None
+
+
+def timeline_pipeline(query, limit=None, cursor=None):
+    """Return the aggregation stages reading the same page of articles as a
+    timeline query."""
+    stages = [{"$match": after_cursor(query, cursor)}, {"$sort": dict(TIMELINE_SORT)}]
+    if limit:
+        stages.append({"$limit": limit + 1})
+    stages.append({"$project": TIMELINE_PROJECTION})
+    return stages
+
+
+def split_activity(articles, limit=None):
+    """Split the articles read by an activity pipeline into the pages of
+    transcripts and news, each along with the cursor of its next page."""
+    articles = sorted(articles, key=lambda a: (a["date"], a["_id"]), reverse=True)
+    transcripts = [a for a in articles if "transcript" in a.get("tags", [])]
+    news = [a for a in articles if "transcript" not in a.get("tags", [])]
+    return {
+        "transcripts": paginate(transcripts, limit),
+        "news": paginate(news, limit),
+    }
+
+
+def _date_range(query, before=None, after=None):
+    if before and isinstance(before, date):
+        before = datetime(before.year, before.month, before.day)
+    if after and isinstance(after, date):
+        after = datetime(after.year, after.month, after.day)
 
+    if before:
+        if "date" not in query:
+            query["date"] = {}
+        query["date"]["$lt"] = (
+            datetime.fromisoformat(before) if isinstance(before, str) else before
+        )
+    if after:
+        if "date" not in query:
+            query["date"] = {}
+        query["date"]["$gte"] = (
+            datetime.fromisoformat(after) if isinstance(after, str) else after
+        )
+
+    return query
+
+
+class Articles:
+    @staticmethod
+    def ensure_indexes():
+        """Create the index the timeline queries are served from, matching on
+        tags and sorting by date. Does nothing if it already exists."""
+        client[config.mongo.db]["articles"].create_index(
+            [("tags", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+            name="tags_date",
+        )
+
+    @staticmethod
+    def timeline(query, limit=None, cursor=None, timeout=None):
+        """Return the page of at most `limit` articles matching `query` that
+        follows `cursor`, newest first and projected to the timeline fields,
+        along with the cursor of the next page. The server aborts the query
+        after `timeout` seconds."""
         collection = client[config.mongo.db]["articles"]
+        find = collection.find(
+            after_cursor(query, cursor),
+            TIMELINE_PROJECTION,
+            sort=TIMELINE_SORT,
+            batch_size=config.mongo.batch_size,
+        )
+        if limit:
+            find = find.limit(limit + 1)
+        if timeout:
+            find = find.max_time_ms(int(timeout * 1000))
+
+        with phase("mongo"):
+            return paginate(list(find), limit)
+
+    @staticmethod
+    def transcripts_query(tickers, before=None, after=None):
+        query = {"$and": [{"tags": "transcript"}, {"tags": {"$in": tickers}}]}
+        return _date_range(query, before=before, after=after)
 
-        return list(collection.find(query))
-    
     @staticmethod
-    def news(tickers, before=None, after=None):
+    def transcripts(
+        tickers, before=None, after=None, limit=None, cursor=None, timeout=None
+    ):
+        return Articles.timeline(
+            Articles.transcripts_query(tickers, before=before, after=after),
+            limit=limit,
+            cursor=cursor,
+            timeout=timeout,
+        )
 
-        if before and isinstance(before, date):
-            before = datetime(before.year, before.month, before.day)
-        if after and isinstance(after, date):
-            after = datetime(after.year, after.month, after.day)
+    @staticmethod
+    def news_query(tickers, before=None, after=None):
+        query = {
+            "$and": [{"tags": {"$nin": ["transcript"]}}, {"tags": {"$in": tickers}}]
+        }
+        return _date_range(query, before=before, after=after)
 
-        query = {'$and' : [{"tags": {'$nin': ["transcript"]}}, {"tags": {"$in": tickers}}]}
+    @staticmethod
+    def news(tickers, before=None, after=None, limit=None, cursor=None, timeout=None):
+        return Articles.timeline(
+            Articles.news_query(tickers, before=before, after=after),
+            limit=limit,
+            cursor=cursor,
+            timeout=timeout,
+        )
 
-        if before:
-            if "date" not in query:
-                query["date"] = {}
-            query["date"]["$lt"] = (
-                datetime.fromisoformat(before) if isinstance(before, str) else before
-            )
-        if after:
-            if "date" not in query:
-                query["date"] = {}
-            query["date"]["$gte"] = (
-                datetime.fromisoformat(after) if isinstance(after, str) else after
-            )
+    @staticmethod
+    def activity_pipeline(tickers, before=None, after=None, limit=None, cursors=None):
+        """Return the pipeline reading a page of transcripts and a page of news
+        in one round trip. Each branch is matched, sorted and limited on its
+        own over the tags_date index and the news are appended with
+        $unionWith."""
+        cursors = cursors or {}
+        transcripts = timeline_pipeline(
+            Articles.transcripts_query(tickers, before=before, after=after),
+            limit=limit,
+            cursor=cursors.get("transcripts"),
+        )
+        news = timeline_pipeline(
+            Articles.news_query(tickers, before=before, after=after),
+            limit=limit,
+            cursor=cursors.get("news"),
+        )
+        return transcripts + [{"$unionWith": {"coll": "articles", "pipeline": news}}]
 
-        collection = client[config.mongo.db]["articles"]
+    @staticmethod
+    def activity(
+        tickers, before=None, after=None, limit=None, cursors=None, timeout=None
+    ):
+        """Return the pages of transcripts and news of the tickers keyed by
+        "transcripts" and "news", each along with the cursor of its next page.
+        The server aborts the query after `timeout` seconds."""
+        pipeline = Articles.activity_pipeline(
+            tickers, before=before, after=after, limit=limit, cursors=cursors
+        )
+        options = {"batchSize": config.mongo.batch_size}
+        if timeout:
+            options["maxTimeMS"] = int(timeout * 1000)
 
-        return list(collection.find(query))
+        with phase("mongo"):
+            articles = client[config.mongo.db]["articles"].aggregate(
+                pipeline, **options
+            )
+            return split_activity(list(articles), limit)
@@ -1,19 +1,92 @@
+import functools
+import zlib
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
 
+# Prices are stored as a hive partitioned parquet dataset i.e.
+# prices/bucket=12/year=2021/part-0.parquet so that reads for a handful of
+# tickers over a few years only open the files they need.
+DATASET = "prices"
+BUCKETS = 64
 
-def prices(tickers=None, start=None, end=None):
-    df = pd.read_parquet("prices.parquet")
-    filters = pd.array([True] * len(df.index))
+COLUMNS = {
+    "date": "Date",
+    "symbol": "Symbol",
+    "adj_close": "Adj Close",
+    "open": "Open",
+    "close": "Close",
+    "high": "High",
+    "low": "Low",
+    "volume": "Volume",
+}
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("bucket", pa.int32()), ("year", pa.int32())]), flavor="hive"
+)
+
+
+def bucket(symbol):
+    """Return the partition bucket of a symbol. crc32 is used rather than
+    hash() as the latter is salted per interpreter."""
+    return zlib.crc32(symbol.encode()) % BUCKETS
+
+
+def write_partitions(df, path=DATASET):
+    """Write rows from the prices table to the partitioned dataset. Rows are
+    sorted by symbol and date so that the row group statistics can be used to
+    skip row groups that do not contain the requested symbols."""
+    if df.empty:
+        return
+
+    df = df.rename(columns=COLUMNS).sort_values(["Symbol", "Date"])
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["bucket"] = df["Symbol"].map(bucket).astype("int32")
+    df["year"] = df["Date"].dt.year.astype("int32")
+
+    year = df["year"].iloc[0]
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        path,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{year}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def prices(tickers=None, start=None, end=None, path=DATASET):
+    dataset = ds.dataset(
+        path,
+        format="parquet",
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+    filters = []
     if start:
-        filters &= df.index >= start
+        start = pd.Timestamp(start)
+        filters.append(ds.field("year") >= start.year)
+        filters.append(ds.field("Date") >= start.to_pydatetime())
 
     if end:
-        filters &= df.index <= end
+        end = pd.Timestamp(end)
+        filters.append(ds.field("year") <= end.year)
+        filters.append(ds.field("Date") <= end.to_pydatetime())
 
     if tickers:
-        df = df[filters & df["Symbol"].isin(tickers).array]
-    else:
-        df = df[filters]
+        filters.append(ds.field("bucket").isin(sorted({bucket(t) for t in tickers})))
+        filters.append(ds.field("Symbol").isin(tickers))
+
+    df = (
+        dataset.to_table(
+            columns=["Date", "Symbol", "Close"],
+            filter=functools.reduce(lambda a, b: a & b, filters) if filters else None,
+        )
+        .to_pandas()
+        .set_index("Date")
+    )
 
     return df.pivot(columns="Symbol", values="Close").ffill().replace({np.nan: None})
@@ -0,0 +1,95 @@
+import datetime
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshQueue:
+    """Refreshes companies on background threads so that requests are served
+    whatever is stored right away and never wait on a third party.
+
+    A ticker is queued at most once until its refresh completes, at most
+    `maxsize` tickers are queued and refreshes are paced by the optional
+    `bucket`, a sickle.TokenBucket. A ticker whose refresh failed is not
+    queued again for `backoff` seconds. Companies that were never refreshed
+    or were last refreshed longer than `max_age` ago are stale."""
+
+    def __init__(
+        self, refresh, max_age, workers=1, maxsize=1000, bucket=None, backoff=3600
+    ):
+        self._refresh = refresh
+        self.max_age = max_age
+        self.workers = workers
+        self.backoff = backoff
+        self._bucket = bucket
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pending = set()
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def stale(self, company):
+        return (
+            company.last_modified is None
+            or company.last_modified < datetime.date.today() - self.max_age
+        )
+
+    def refresh_if_stale(self, company):
+        if self.stale(company):
+            self.enqueue(company.ticker)
+
+    def enqueue(self, ticker):
+        """Queue a refresh of `ticker` unless one is already pending or its
+        last refresh failed less than `backoff` seconds ago. Returns whether
+        the ticker was queued."""
+        with self._lock:
+            if ticker in self._pending:
+                return False
+
+            failed = self._failed.get(ticker)
+            if failed is not None and time.monotonic() - failed < self.backoff:
+                return False
+
+            try:
+                self._queue.put_nowait(ticker)
+            except queue.Full:
+                logger.warning(f'Refresh queue is full, dropping "{ticker}"')
+                return False
+
+            self._pending.add(ticker)
+            self._start()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return set(self._pending)
+
+    def _start(self):
+        # Threads are started with the first refresh so that importing the
+        # queue, as sickle and the benchmarks do, does not spawn them.
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._run, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            ticker = self._queue.get()
+            try:
+                if self._bucket:
+                    self._bucket.acquire()
+                self._refresh(ticker)
+            except Exception:
+                logger.exception(f'Failed to refresh "{ticker}"')
+                with self._lock:
+                    self._failed[ticker] = time.monotonic()
+            else:
+                with self._lock:
+                    self._failed.pop(ticker, None)
+            finally:
+                with self._lock:
+                    self._pending.discard(ticker)
+                self._queue.task_done()
@@ -2,7 +2,4 @@ tickers=$(curl -s "https://app.allokate.ai/api/market/earnings" | jq -r ".data[]
 
 echo $tickers
 
-for ticker in $tickers; do 
-    python sickle.py company $ticker;
-    sleep $((10 + $(($RANDOM % 5))))
-done
+python sickle.py -v companies --checkpoint .scrape.checkpoint $tickers && rm -f .scrape.checkpoint
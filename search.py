@@ -0,0 +1,169 @@
+import bisect
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+
+class CompanyIndex:
+    """An in-memory index for searching companies by ticker and name.
+
+    Companies are ranked by how well they match the search string:
+
+    1. the ticker is the search string
+    2. the ticker starts with the search string
+    3. the name starts with the search string
+    4. a word in the name starts with the search string
+    5. the ticker contains the search string
+
+    with shorter tickers ranked first within each group. Substring matches on
+    tickers are found through an n-gram index and prefix matches on names
+    through a sorted list of words so a search never scans every company.
+
+    The index is loaded lazily through `loader`, rebuilt after `ttl` seconds
+    and can be dropped explicitly through `invalidate` when companies change.
+    A single company that changed is replaced in place through `update`.
+    """
+
+    GRAM = 3
+
+    def __init__(self, loader, ttl):
+        self._loader = loader
+        self.ttl = ttl
+        self._state = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._state = None
+
+    def update(self, company):
+        """Replace the entry of a company that is already indexed, leaving the
+        rest of the index as it is. Drops the index if the company is new."""
+        with self._lock:
+            state = self._state
+            if state is None:
+                return
+
+            i = state.tickers.get((company.ticker or "").lower())
+            if i is None:
+                self._state = None
+                return
+
+            # Readers may be searching the current state, so the lists that
+            # change are copied rather than modified.
+            companies = list(state.companies)
+            companies[i] = company
+            names = [entry for entry in state.names if entry[1] != i]
+            words = [entry for entry in state.words if entry[1] != i]
+
+            name = (company.name or "").lower()
+            bisect.insort(names, (name, i))
+            for word in self._words(name):
+                bisect.insort(words, (word, i))
+
+            self._state = SimpleNamespace(
+                **{
+                    **vars(state),
+                    "companies": companies,
+                    "names": names,
+                    "words": words,
+                }
+            )
+
+    def search(self, query, limit=None):
+        state = self._current()
+        query = query.strip().lower()
+
+        if not query:
+            return state.companies[:limit]
+
+        ids = []
+        seen = set()
+
+        def add(tier):
+            for i in sorted(tier - seen):
+                ids.append(i)
+            seen.update(tier)
+
+        exact = state.tickers.get(query)
+        add({exact} if exact is not None else set())
+
+        substring = self._ticker_substring(state, query)
+        add({i for i in substring if state.lowered[i].startswith(query)})
+        add(self._prefixed(state.names, query))
+        add(self._prefixed(state.words, query))
+        add(substring)
+
+        return [state.companies[i] for i in ids[:limit]]
+
+    def _current(self):
+        state = self._state
+        if state is not None and state.expires > time.monotonic():
+            return state
+
+        with self._lock:
+            state = self._state
+            if state is None or state.expires <= time.monotonic():
+                state = self._build(self._loader())
+                self._state = state
+        return state
+
+    def _build(self, companies):
+        # Positions in the index follow the order results are ranked in within
+        # a group so that sorting matches is a sort of integers.
+        companies = sorted(
+            (c for c in companies if c.ticker),
+            key=lambda c: (len(c.ticker), c.ticker),
+        )
+        lowered = [c.ticker.lower() for c in companies]
+
+        grams = {}
+        for i, ticker in enumerate(lowered):
+            for n in range(1, self.GRAM + 1):
+                for j in range(len(ticker) - n + 1):
+                    grams.setdefault(ticker[j : j + n], set()).add(i)
+
+        names = []
+        words = []
+        for i, c in enumerate(companies):
+            name = (c.name or "").lower()
+            names.append((name, i))
+            for word in self._words(name):
+                words.append((word, i))
+
+        return SimpleNamespace(
+            companies=companies,
+            lowered=lowered,
+            tickers={ticker: i for i, ticker in enumerate(lowered)},
+            grams=grams,
+            names=sorted(names),
+            words=sorted(words),
+            expires=time.monotonic() + self.ttl,
+        )
+
+    def _ticker_substring(self, state, query):
+        if len(query) <= self.GRAM:
+            return state.grams.get(query, set())
+
+        candidates = None
+        for j in range(len(query) - self.GRAM + 1):
+            ids = state.grams.get(query[j : j + self.GRAM], set())
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+
+        return {i for i in candidates if query in state.lowered[i]}
+
+    @staticmethod
+    def _words(name):
+        return set(re.findall(r"\w+", name))
+
+    @staticmethod
+    def _prefixed(entries, query):
+        matches = set()
+        for k in range(bisect.bisect_left(entries, (query,)), len(entries)):
+            text, i = entries[k]
+            if not text.startswith(query):
+                break
+            matches.add(i)
+        return matches
@@ -2,11 +2,19 @@ from pprint import pprint
 from types import SimpleNamespace
 import argparse
 import datetime
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 import pandas as pd
 import yfinance as yf
 
 import db
+import mongo
+import prices
 
 
 def get_companies_registered_with_the_sec():
@@ -33,7 +41,7 @@ def get_companies_registered_with_the_sec():
 
 def update_cik_info():
     companies = get_companies_registered_with_the_sec()
-    db.Company.bulk_upsert_cik_info(companies)
+    return db.Company.bulk_upsert_cik_info(companies)
 
 
 def get_basic_company_info(ticker):
@@ -43,7 +51,7 @@ def get_basic_company_info(ticker):
         **{
             "ticker": ticker,
             "name": data["shortName"],
-            "logo": data["logo_url"],
+            "logo": data.get("logo_url"),
             "description": data["longBusinessSummary"],
             "sector": data["sector"] if "sector" in data else None,
             "shares_outstanding": data["sharesOutstanding"]
@@ -68,6 +76,98 @@ def update_basic_company_info(ticker):
     return info
 
 
+class TokenBucket:
+    """A thread safe token bucket allowing on average `rate` acquisitions per
+    second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def harvest_basic_company_info(
+    tickers,
+    fetch=get_basic_company_info,
+    workers=4,
+    rate=0.1,
+    burst=1,
+    batch_size=25,
+    checkpoint=None,
+    log=print,
+):
+    """Fetch the basic info of many companies on a pool of `workers` threads,
+    making at most `rate` requests per second across all of them, and upsert
+    the results `batch_size` companies at a time.
+
+    Tickers that have been written are appended to the `checkpoint` file, if
+    given, and skipped when the harvest is run again so an interrupted harvest
+    can be resumed. `fetch` is called with a ticker and must return the same
+    shape as `get_basic_company_info`. Returns the tickers that failed."""
+    done = set()
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            done = {line.strip() for line in f if line.strip()}
+
+    pending = [t for t in dict.fromkeys(tickers) if t not in done]
+    log(f"Fetching company data for {len(pending)} tickers ({len(done)} already done)")
+
+    bucket = TokenBucket(rate, burst)
+
+    def work(ticker):
+        bucket.acquire()
+        return fetch(ticker)
+
+    def flush(batch):
+        db.Company.bulk_upsert_basic_info(batch)
+        if checkpoint:
+            with open(checkpoint, "a") as f:
+                f.writelines(f"{info.ticker}\n" for info in batch)
+        log(f"Wrote {len(batch)} companies")
+
+    batch = []
+    failed = []
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(work, ticker): ticker for ticker in pending}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                batch.append(future.result())
+            except Exception as e:
+                log(f"Failed to fetch company data for {ticker}: {e!r}")
+                failed.append(ticker)
+                continue
+
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        if batch:
+            flush(batch)
+
+    return failed
+
+
 def download_pricing_data(tickers, **kwargs):
     """Downloads data from Yahoo Fiance returning a series of rows where each
     row contains the information for a given symbol on a given date. For example:
@@ -102,13 +202,43 @@ def combine_pricing_data(df1, df2):
 
 
 def download_incremental_pricing_data():
-    # Determine where that last download left off.
+    # Determine where the last download left off for each symbol.
     tickers = db.Price.tickers()
-    start = db.Price.most_recent_date()
+    watermarks = db.Price.most_recent_dates(tickers)
+
+    # Symbols that left off on the same date are downloaded together while
+    # symbols without any prices yet get their full history.
+    groups = {}
+    for ticker in tickers:
+        groups.setdefault(watermarks.get(ticker), []).append(ticker)
+
+    frames = []
+    for start, group in groups.items():
+        if start is None:
+            frames.append(download_pricing_data(group, period="max"))
+        else:
+            frames.append(download_pricing_data(group, start=start))
 
-    # Download the latest incremental data.
-    df = download_pricing_data(tickers, start=start)
-    return df
+    return pd.concat(frames) if frames else None
+
+
+def export_pricing_data(path):
+    """Export the prices table to a partitioned parquet dataset one year at a
+    time. The dataset is written next to `path` and swapped in once complete
+    so readers never see a partial export."""
+    first, last = db.Price.earliest_date(), db.Price.most_recent_date()
+    if first is None:
+        return
+
+    tmp = f"{path}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    for year in range(first.year, last.year + 1):
+        df = db.Price.dump(datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1))
+        prices.write_partitions(df, tmp)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp, path)
 
 
 def main():
@@ -122,10 +252,43 @@ def main():
     prices_parser.add_argument("--init", action="store_true")
     prices_parser.add_argument("--ticker", dest="tickers", action="append")
     prices_parser.add_argument("--dry-run", dest="dry_run", action="store_true")
+    prices_parser.add_argument(
+        "--chunk-size", dest="chunk_size", type=int, default=50000
+    )
 
     company_parser = subcommand_parser.add_parser("company")
     company_parser.add_argument("ticker")
 
+    companies_parser = subcommand_parser.add_parser("companies")
+    companies_parser.add_argument("tickers", nargs="*")
+    companies_parser.add_argument(
+        "--file", help="file of whitespace separated tickers or - for stdin"
+    )
+    companies_parser.add_argument("--workers", type=int, default=4)
+    companies_parser.add_argument(
+        "--rate", type=float, default=0.1, help="requests per second"
+    )
+    companies_parser.add_argument("--burst", type=int, default=1)
+    companies_parser.add_argument(
+        "--batch-size", dest="batch_size", type=int, default=25
+    )
+    companies_parser.add_argument("--checkpoint")
+
+    symbols_parser = subcommand_parser.add_parser("symbols")
+    symbols_parser.add_argument("action", choices=["list", "add", "remove", "sync"])
+    symbols_parser.add_argument("symbols", nargs="*")
+
+    rollups_parser = subcommand_parser.add_parser("rollups")
+    rollups_parser.add_argument("--ticker", dest="tickers", action="append")
+    rollups_parser.add_argument("--since")
+
+    subcommand_parser.add_parser("latest")
+
+    subcommand_parser.add_parser("indexes")
+
+    export_parser = subcommand_parser.add_parser("export")
+    export_parser.add_argument("--path", default=prices.DATASET)
+
     args = parser.parse_args()
 
     def log(*msg):
@@ -154,18 +317,78 @@ def main():
 
             df = download_pricing_data(tickers, period="max")
 
-        if args.dry_run:
+        if df is None or df.empty:
+            print("No new pricing data")
+        elif args.dry_run:
             print(df)
         else:
-            db.Price.upsert(df, init=args.init)
+            db.Price.upsert(df, init=args.init, chunk_size=args.chunk_size, log=log)
             log(f"Data written to db")
 
+            if args.init:
+                db.PriceRollup.refresh(symbols=df["Symbol"].unique().tolist())
+            else:
+                # Each symbol is refreshed from its own first downloaded price,
+                # so that the full history of a newly tracked symbol does not
+                # make every other symbol refresh from as far back.
+                starts = df.index.to_series().groupby(df["Symbol"].values).min()
+                for since, symbols in starts.groupby(starts):
+                    db.PriceRollup.refresh(symbols=symbols.index.tolist(), since=since)
+            log(f"Rollups refreshed")
+
     elif args.subcommand == "company":
         ticker = args.ticker.upper()
         log(f"Fetching company data for", ticker)
         info = update_basic_company_info(ticker)
         pprint(dict(vars(info)))
 
+    elif args.subcommand == "companies":
+        tickers = list(args.tickers)
+        if args.file:
+            f = sys.stdin if args.file == "-" else open(args.file)
+            with f:
+                tickers += f.read().split()
+
+        failed = harvest_basic_company_info(
+            [t.upper() for t in tickers],
+            workers=args.workers,
+            rate=args.rate,
+            burst=args.burst,
+            batch_size=args.batch_size,
+            checkpoint=args.checkpoint,
+            log=log,
+        )
+        if failed:
+            print(f"Failed to fetch company data for {len(failed)} tickers: {failed}")
+            exit(1)
+
+    elif args.subcommand == "symbols":
+        symbols = [s.upper() for s in args.symbols]
+        if args.action == "add":
+            db.TrackedSymbol.add(symbols)
+        elif args.action == "remove":
+            db.TrackedSymbol.remove(symbols)
+        elif args.action == "sync":
+            db.TrackedSymbol.sync_from_transactions()
+        print("\n".join(db.TrackedSymbol.list()))
+
+    elif args.subcommand == "rollups":
+        tickers = [t.upper() for t in args.tickers] if args.tickers else None
+        log(f"Refreshing rollups since", args.since or "the beginning")
+        db.PriceRollup.refresh(symbols=tickers, since=args.since)
+
+    elif args.subcommand == "latest":
+        log(f"Rebuilding the latest prices")
+        db.LatestPrice.rebuild()
+
+    elif args.subcommand == "export":
+        log(f"Exporting prices to", args.path)
+        export_pricing_data(args.path)
+
+    elif args.subcommand == "indexes":
+        mongo.Articles.ensure_indexes()
+        log("Indexes created")
+
     else:
         pass
 
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# The modules under test are at the root of the repository. They connect to
+# the configured database on import, so the tests use a throwaway SQLite
+# database instead, which db creates in the working directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["POSTGRES_HOST"] = ""
+os.chdir(tempfile.mkdtemp())
@@ -0,0 +1,132 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import db
+import sickle
+
+
+def info(ticker):
+    return SimpleNamespace(
+        ticker=ticker,
+        name=f"{ticker} Inc",
+        logo=None,
+        sector=None,
+        description=None,
+        shares_outstanding=None,
+    )
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """The batches of companies upserted by the harvest."""
+    batches = []
+    monkeypatch.setattr(
+        db.Company, "bulk_upsert_basic_info", lambda batch: batches.append(batch)
+    )
+    return batches
+
+
+def harvest(tickers, **kwargs):
+    kwargs.setdefault("fetch", info)
+    kwargs.setdefault("rate", 1000)
+    kwargs.setdefault("burst", 1000)
+    kwargs.setdefault("log", lambda *msg: None)
+    return sickle.harvest_basic_company_info(tickers, **kwargs)
+
+
+def test_harvest_writes_every_ticker_once_in_batches(written):
+    failed = harvest(["A", "B", "C", "A", "D", "E"], batch_size=2)
+
+    assert failed == []
+    assert [len(batch) for batch in written] == [2, 2, 1]
+    assert sorted(c.ticker for batch in written for c in batch) == [
+        "A",
+        "B",
+        "C",
+        "D",
+        "E",
+    ]
+
+
+def test_harvest_is_rate_limited(written):
+    started = time.monotonic()
+    harvest(["A", "B", "C", "D", "E"], workers=5, rate=20, burst=1)
+
+    # The first request is made right away and each other one waits for a
+    # token, 1 / rate seconds apart.
+    assert time.monotonic() - started >= 4 / 20
+
+
+def test_harvest_bounds_concurrent_fetches_by_workers(written):
+    lock = threading.Lock()
+    running = 0
+    most = 0
+
+    def fetch(ticker):
+        nonlocal running, most
+        with lock:
+            running += 1
+            most = max(most, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return info(ticker)
+
+    harvest([f"T{i}" for i in range(8)], fetch=fetch, workers=2)
+
+    assert most == 2
+
+
+def test_harvest_resumes_from_checkpoint(written, tmp_path):
+    checkpoint = tmp_path / "checkpoint"
+    checkpoint.write_text("A\nB\n")
+    fetched = []
+
+    def fetch(ticker):
+        fetched.append(ticker)
+        return info(ticker)
+
+    harvest(["A", "B", "C", "D"], fetch=fetch, checkpoint=str(checkpoint))
+
+    assert sorted(fetched) == ["C", "D"]
+    assert sorted(checkpoint.read_text().split()) == ["A", "B", "C", "D"]
+
+
+def test_harvest_reports_failures_and_leaves_them_out_of_checkpoint(written, tmp_path):
+    checkpoint = tmp_path / "checkpoint"
+
+    def fetch(ticker):
+        if ticker == "B":
+            raise KeyError("shortName")
+        return info(ticker)
+
+    failed = harvest(["A", "B", "C"], fetch=fetch, checkpoint=str(checkpoint))
+
+    assert failed == ["B"]
+    assert sorted(c.ticker for batch in written for c in batch) == ["A", "C"]
+    assert sorted(checkpoint.read_text().split()) == ["A", "C"]
+
+
+def test_companies_exits_with_an_error_when_tickers_fail(monkeypatch, capsys):
+    monkeypatch.setattr(
+        sickle, "harvest_basic_company_info", lambda tickers, **kwargs: ["B"]
+    )
+    monkeypatch.setattr("sys.argv", ["sickle.py", "companies", "A", "B"])
+
+    with pytest.raises(SystemExit) as e:
+        sickle.main()
+
+    assert e.value.code == 1
+    assert "['B']" in capsys.readouterr().out
+
+
+def test_companies_exits_cleanly_when_every_ticker_is_written(monkeypatch):
+    monkeypatch.setattr(
+        sickle, "harvest_basic_company_info", lambda tickers, **kwargs: []
+    )
+    monkeypatch.setattr("sys.argv", ["sickle.py", "companies", "A", "B"])
+
+    sickle.main()